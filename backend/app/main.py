@@ -7,14 +7,22 @@ from fastapi.middleware.cors import CORSMiddleware
 from langfuse.decorators import langfuse_context
 
 from backend.app.router import EngineRouter
+from ghost_writer.modules.corpus import close_web_corpus
+from ghost_writer.modules.crawler import close_crawler_pool
+from ghost_writer.modules.fetcher import close_web_fetcher
+from ghost_writer.modules.search import close_search_clients
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Remove files before shutdown
+    Close the web clients, stop the corpus compaction and remove files before shutdown
     """
     yield
+    close_web_fetcher()
+    close_crawler_pool()
+    close_web_corpus()
+    close_search_clients()
     langfuse_context.flush()
     try:
         items = os.listdir("backend/uploads")
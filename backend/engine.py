@@ -4,6 +4,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from distutils.util import strtobool
 from threading import Lock
 from typing import Dict, List
+from urllib.parse import urlparse
 from uuid import uuid4
 
 import yaml
@@ -22,7 +23,7 @@ from backend.utils.prompts import (
 )
 from ghost_writer.modules.knowledgebase import KnowledgeBaseBuilder
 from ghost_writer.modules.storm import Storm
-from ghost_writer.modules.vectordb import Qdrant
+from ghost_writer.modules.vectordb import get_vectordb, session_collection
 from ghost_writer.utils.logger import logger
 from ghost_writer.utils.prompt import Prompt
 from ghost_writer.utils.workers import Worker
@@ -44,17 +45,46 @@ langfuse_context.configure(
 )
 
 
+def company_key(name: str, website: str) -> str:
+    """
+    Identifies a company across sessions by its normalized name and website host.
+    Args:
+        name (str): Company name as extracted from the job description
+        website (str): Company website, with or without scheme
+
+    Returns:
+        str: Key of the company in the knowledge cache
+    """
+    tokens = re.sub(r"[^a-z0-9]+", " ", name.lower()).split()
+    while tokens and tokens[-1] in {"inc", "llc", "ltd", "gmbh", "corp", "co", "plc"}:
+        tokens.pop()
+    host = urlparse(website if "//" in website else f"//{website}").netloc.lower()
+    host = host.removeprefix("www.")
+    return f"company:{' '.join(tokens)}:{host}"
+
+
 class WriterEngine:
     """
     Engine for the orchestration of the ghost wrtier framework.
     """
 
     def __init__(self):
+        self.session_id = str(uuid4())
         self.user_collection_name = "user"
         self.company_collection_name = "company"
+        self.collections = {
+            Entity.USER: session_collection(self.user_collection_name, self.session_id),
+            Entity.COMPANY: session_collection(
+                self.company_collection_name, self.session_id
+            ),
+        }
         self.workflow = Storm()
-        self.vectordb = Qdrant()
-        self.session_id = str(uuid4())
+        self.vectordb = get_vectordb()
+        deleted = self.vectordb.delete_stale_collections(
+            engine_config["session"]["ttl"]
+        )
+        if deleted:
+            logger.info(f"Deleted {len(deleted)} stale session collections")
 
     def get_job_kb(self, text: str):
         """
@@ -72,6 +102,7 @@ class WriterEngine:
             portfolio_chunk_overlap=porftfolio_config["chunk_overlap"],
             webpage_chunk_size=search_config["webpage"]["chunk_size"],
             webpage_chunk_overlap=search_config["webpage"]["chunk_overlap"],
+            session_id=self.session_id,
         )
         logger.info("Company Knowledge Base Created")
 
@@ -89,6 +120,7 @@ class WriterEngine:
             retrieval_limit=qdrant_config["query"]["limit"],
             portfolio_chunk_size=porftfolio_config["chunk_size"],
             portfolio_chunk_overlap=porftfolio_config["chunk_overlap"],
+            session_id=self.session_id,
         )
         logger.info("User Knowledge Base Created")
 
@@ -98,19 +130,21 @@ class WriterEngine:
 
         """
         docs = self.user_knowledge_base.source
+        keys = self.user_knowledge_base.source_keys
         self.user_report = []
-        for doc in docs:
+        for doc, key in zip(docs, keys):
             result = self.user_knowledge_base.structured_document(
-                prompt=Prompt(prompt=PDF_PROMPT, doc=doc)
+                prompt=Prompt(prompt=PDF_PROMPT, doc=doc), cache_key=key
             )
             self.user_report.append(result)
         logger.info("User Report Loaded")
 
         docs = self.company_knowledge_base.source
+        keys = self.company_knowledge_base.source_keys
         self.company_report = []
-        for doc in docs:
+        for doc, key in zip(docs, keys):
             result = self.company_knowledge_base.structured_document(
-                prompt=Prompt(prompt=JD_PROMPT, doc=doc)
+                prompt=Prompt(prompt=JD_PROMPT, doc=doc), cache_key=key
             )
             self.company_report.append(result)
 
@@ -153,6 +187,11 @@ class WriterEngine:
                 search_prompt=research_prompt,
                 gen_prompt=portfolio_prompt,
                 search_limit=search_config["url"]["limit"],
+                cache_key=company_key(
+                    self.company_report[0].company.name,
+                    self.company_report[0].company.website,
+                ),
+                uncached_topics=["job_specific_context"],
             )
         )
         # langfuse setup
@@ -163,21 +202,37 @@ class WriterEngine:
         )
 
         logger.info("Company Portfolio Created")
+        crawl_stats = self.company_knowledge_base.search.crawl_stats()
+        logger.info(
+            f"Crawled {crawl_stats['crawls']} times, average {crawl_stats['avg_crawl_time']:.1f}s per crawl, "
+            f"{crawl_stats['browser_starts']} browser starts"
+        )
+        logger.info(f"Fetch tiers {crawl_stats['tiers']}")
+        logger.info(f"Crawler {crawl_stats['crawler']}")
+        logger.info(
+            f"Slowest crawled hosts {dict(list(crawl_stats['hosts'].items())[:5])}"
+        )
+        logger.info(
+            f"Search cache {crawl_stats['search_cache']}, page cache {crawl_stats['page_cache']}, "
+            f"HyDE cache {crawl_stats['hyde_cache']}"
+        )
+        logger.info(f"Near-duplicates dropped {crawl_stats['duplicates']}")
+        logger.info(f"Web corpus {crawl_stats['corpus']}")
         langfuse_context.flush()
 
     def cross_knowledge_base_query(self, entity: Entity, queries: List[str]):
         """
-        Query across multiple collections in Qdrant
+        Query across multiple collections in the vector database
         """
-        collection = entity.value.lower()
+        collection = self.collections[entity]
         if collection not in self.vectordb.get_collections():
             raise ValueError("Invalid collections name")
 
         result_list = []
-        for query in queries:
-            results = self.vectordb.query_documents(
-                collection, query, limit=qdrant_config["query"]["limit"]
-            )
+        query_results = self.vectordb.query_many(
+            collection, queries, limit=qdrant_config["query"]["limit"]
+        )
+        for query, results in zip(queries, query_results):
             result_list.append(
                 {
                     "query": query,
@@ -281,6 +336,7 @@ class WriterEngine:
         """
         logger.info("Initiating conversation simulation")
         iterations = engine_config["simulation"]["iterations"]
+        prompt_sizes = []
         for _ in range(iterations):
             message = self.workflow.get_questions(
                 worker,
@@ -295,9 +351,15 @@ class WriterEngine:
             )
             results = self.cross_knowledge_base_query(**queries.model_dump())
 
+            answer_prompt = self.answer_prompt.format(search_results=results)
+            prompt_sizes.append(self.workflow.llm.count_tokens(str(answer_prompt)))
             self.workflow.get_answers(
                 worker,
-                self.answer_prompt.format(search_results=results),
+                answer_prompt,
+            )
+        if prompt_sizes:
+            logger.info(
+                f"{worker.role}: average answer prompt size {sum(prompt_sizes) / len(prompt_sizes):.0f} tokens over {len(prompt_sizes)} turns"
             )
         logger.info("Conversation simulation completed")
         return worker.conversation.get_messages()
@@ -334,6 +396,10 @@ class WriterEngine:
                 worker = future_results[future]
                 conversation_history = future.result()
                 conversations.append({worker: conversation_history})
+        cache_stats = self.vectordb.cache_stats()
+        logger.info(
+            f"Query cache hit rate {cache_stats['hit_rate']:.0%} ({cache_stats['hits']} hits, {cache_stats['misses']} misses)"
+        )
         logger.info("Parallel Conversation Completed")
         return conversations
 
@@ -0,0 +1,86 @@
+"""
+Throughput of the page text extraction over a fixed HTML corpus.
+The corpus is generated from a seed, so every run extracts the same pages. Pages are extracted
+inline one after another and then through the process pool of the web fetcher, as the fetch
+threads and the crawler submit them.
+
+Run from the repository root:
+    python -m benchmarks.extract --pages 200 --seed 0
+"""
+
+import argparse
+import random
+import time
+from typing import List
+
+from ghost_writer.modules.fetcher import WebFetcher, extract_text, fetch_config
+
+
+def html_corpus(pages: int, seed: int) -> List[str]:
+    """
+    Article pages with navigation, a few paragraphs, a table and a footer.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"word{idx}" for idx in range(5000)]
+
+    def sentence() -> str:
+        return " ".join(rng.choices(vocabulary, k=rng.randint(8, 24))).capitalize()
+
+    corpus = []
+    for page in range(pages):
+        paragraphs = "".join(
+            f"<p>{'. '.join(sentence() for _ in range(rng.randint(3, 8)))}.</p>"
+            for _ in range(rng.randint(5, 30))
+        )
+        rows = "".join(
+            f"<tr><td>{sentence()}</td><td>{rng.randint(0, 1000)}</td></tr>"
+            for _ in range(rng.randint(0, 10))
+        )
+        corpus.append(
+            f"<html><head><title>Page {page}</title></head><body>"
+            f"<nav><a href='/'>Home</a><a href='/about'>About</a></nav>"
+            f"<article><h1>{sentence()}</h1>{paragraphs}<table>{rows}</table></article>"
+            f"<footer>{sentence()}</footer></body></html>"
+        )
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = html_corpus(args.pages, args.seed)
+    size = sum(len(html) for html in corpus) / 2**20
+    print(f"{args.pages} pages, {size:.1f}MB of HTML")
+
+    start = time.perf_counter()
+    for html in corpus:
+        extract_text(html)
+    elapsed = time.perf_counter() - start
+    print(f"inline: {elapsed:.2f}s, {args.pages / elapsed:.1f} pages/s")
+
+    fetcher = WebFetcher()
+    try:
+        # the first pages start the worker processes
+        for future in [
+            fetcher.extract(html) for html in corpus[: fetch_config["extract_workers"]]
+        ]:
+            future.result()
+        warmup = fetcher.stats()["extract"]["pages"]
+        start = time.perf_counter()
+        for future in [fetcher.extract(html) for html in corpus]:
+            future.result()
+        elapsed = time.perf_counter() - start
+        print(
+            f"pool of {fetch_config['extract_workers']} workers: {elapsed:.2f}s, "
+            f"{args.pages / elapsed:.1f} pages/s, "
+            f"{fetcher.stats()['extract']['pages'] - warmup} pages extracted"
+        )
+    finally:
+        fetcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Wall time and peak resident memory of the PDF conversion for 1, 10 and 100 page documents.
+Each document is converted whole in a single fresh worker process and with convert_documents,
+which splits it into page ranges converted in parallel by the configured number of workers.
+The documents are generated, so every run converts the same pages.
+
+Run from the repository root:
+    python -m benchmarks.pdf_loader --pages 1 10 100
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pymupdf
+
+from ghost_writer.modules.knowledgebase import (
+    convert_documents,
+    load_pages_in_worker,
+    loader_config,
+)
+from ghost_writer.utils.processes import get_process_context
+
+
+def write_pdf(path: str, pages: int, seed: int = 0):
+    """
+    Writes a document with a heading and a few paragraphs of text on every page.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"word{idx}" for idx in range(5000)]
+    doc = pymupdf.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Section {page_number + 1}", fontsize=16)
+        lines = [" ".join(rng.choices(vocabulary, k=10)) for _ in range(40)]
+        page.insert_text((72, 100), "\n".join(lines), fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    print(
+        f"{loader_config['workers']} workers, {loader_config['pages_per_task']} pages per task"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for pages in args.pages:
+            path = os.path.join(directory, f"{pages}.pdf")
+            write_pdf(path, pages)
+
+            start = time.perf_counter()
+            with ProcessPoolExecutor(1, mp_context=get_process_context()) as executor:
+                _, rss = executor.submit(load_pages_in_worker, path).result()
+            print(
+                f"{pages:>4} pages, single worker: {time.perf_counter() - start:.2f}s, "
+                f"peak RSS {rss:.0f}MB"
+            )
+
+            start = time.perf_counter()
+            _, rss = convert_documents([path])
+            print(
+                f"{pages:>4} pages, convert_documents: {time.perf_counter() - start:.2f}s, "
+                f"peak RSS {rss:.0f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Latency of batches of search API requests on a per-batch client and on the shared async client.
+A local stub server answers every request with a fixed JSON result page and waits connect_delay
+on every new connection, standing in for the TCP and TLS handshakes of a remote search API.
+The per-batch client opens its connections again for every batch, the shared client keeps them
+alive across batches.
+
+Run from the repository root:
+    python -m benchmarks.search_client --batches 20 --queries 5 --connect-delay 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import List
+
+import httpx
+
+from ghost_writer.modules.search import (
+    client_config,
+    close_search_clients,
+    get_async_search_client,
+)
+
+
+def stub_server(connect_delay: float) -> ThreadingHTTPServer:
+    """
+    Keep-alive HTTP server counting the connections it accepts.
+    """
+    body = json.dumps(
+        {
+            "results": [
+                {"title": f"Result {idx}", "url": f"https://example.com/{idx}"}
+                for idx in range(10)
+            ]
+        }
+    ).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            self.server.connections += 1
+            time.sleep(connect_delay)
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.connections = 0
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def search_batch(client: httpx.AsyncClient, url: str, queries: List[str]):
+    responses = await asyncio.gather(
+        *(client.get(url, params={"q": query}) for query in queries)
+    )
+    return [response.json()["results"] for response in responses]
+
+
+def per_batch(url: str, queries: List[str]):
+    async def _per_batch():
+        async with httpx.AsyncClient(
+            timeout=client_config["timeout"],
+            limits=httpx.Limits(max_connections=client_config["max_connections"]),
+        ) as client:
+            return await search_batch(client, url, queries)
+
+    return asyncio.run(_per_batch())
+
+
+def shared(url: str, queries: List[str]):
+    return get_async_search_client().run(
+        lambda client: search_batch(client, url, queries)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--connect-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = stub_server(args.connect_delay)
+    url = f"http://127.0.0.1:{server.server_port}/search"
+    print(
+        f"{args.batches} batches of {args.queries} queries, "
+        f"{args.connect_delay * 1000:.0f}ms per new connection"
+    )
+
+    for name, run in [("per-batch client", per_batch), ("shared client", shared)]:
+        server.connections = 0
+        latencies = []
+        for batch in range(args.batches):
+            queries = [f"query {batch} {idx}" for idx in range(args.queries)]
+            start = time.perf_counter()
+            run(url, queries)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(
+            f"{name}: {sum(latencies):.2f}s total, "
+            f"p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms per batch, "
+            f"{server.connections} connections"
+        )
+
+    close_search_clients()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
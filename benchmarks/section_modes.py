@@ -0,0 +1,94 @@
+"""
+Calls, tokens and wall time of the refine and map_reduce section modes on the same summaries.
+Each query is searched and its results are summarized once, then the section of every query
+is written in both modes from these summaries. Needs the LLM and web search API keys.
+
+Run from the repository root:
+    python -m benchmarks.section_modes --company "Acme" --queries "Acme products" "Acme news"
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+from backend.models.company import CompanyReport
+from ghost_writer.modules.knowledgebase import KnowledgeBaseBuilder, research_config
+from ghost_writer.utils.prompt import Prompt
+
+
+def write_section(
+    kb: KnowledgeBaseBuilder,
+    mode: str,
+    topic: str,
+    summaries: List[Dict[str, str]],
+    gen_prompt: Prompt,
+) -> str:
+    """
+    Writes a section the way research does in the section mode.
+    """
+    if mode == "refine" or not summaries:
+        return kb.refine_article_section(topic, summaries, gen_prompt)
+    with ThreadPoolExecutor(len(summaries)) as executor:
+        drafts = list(
+            executor.map(
+                lambda item: kb.draft_article_subsection(topic, item, gen_prompt),
+                summaries,
+            )
+        )
+    return kb.merge_article_section(topic, drafts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--company", required=True)
+    parser.add_argument("--queries", nargs="+", required=True)
+    parser.add_argument("--limit", type=int, default=3)
+    args = parser.parse_args()
+    load_dotenv(".env")
+
+    kb = KnowledgeBaseBuilder(
+        source=args.company,
+        source_name="benchmark",
+        model=CompanyReport,
+        research=True,
+        retrieval_limit=5,
+        portfolio_chunk_size=1000,
+        portfolio_chunk_overlap=0,
+    )
+    gen_prompt = Prompt(
+        prompt=f"You are a **technical writer** specializing in company reports. Your task is to write specific sections of the report for **{args.company}** using the web search results.",
+    )
+    with ThreadPoolExecutor(research_config["concurrency"]) as executor:
+        summaries = {
+            query: list(
+                executor.map(
+                    kb.summarize_search_result,
+                    kb.search.run(query=query, limit=args.limit),
+                )
+            )
+            for query in args.queries
+        }
+
+    for mode in ["refine", "map_reduce"]:
+        kb.section_usage = {"calls": 0, "tokens": 0}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(len(args.queries)) as executor:
+            list(
+                executor.map(
+                    lambda query: write_section(
+                        kb, mode, query, summaries[query], gen_prompt
+                    ),
+                    args.queries,
+                )
+            )
+        print(
+            f"{mode}: {kb.section_usage['calls']} calls, {kb.section_usage['tokens']} tokens, "
+            f"{time.perf_counter() - start:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import time
+from threading import Event, Lock, Thread
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import yaml
+
+from ghost_writer.modules.vectordb import get_vectordb
+from ghost_writer.utils.logger import logger
+from ghost_writer.utils.urls import canonicalize_url
+
+config = yaml.safe_load(open("config/ghost_writer.yaml", "r"))
+corpus_config = config["knowledge_builder"]["search"]["corpus"]
+cache_config = config["cache"]
+
+COLLECTION_PREFIX = "WebCorpus"
+
+
+def corpus_collection(chunk_size: int) -> str:
+    """
+    Name of the corpus collection of the configured version and chunk size.
+    Bumping the version moves every session to a new collection, the old ones are deleted by
+    the next compaction.
+    """
+    return f"{COLLECTION_PREFIX}-v{corpus_config['version']}-{chunk_size}"
+
+
+class WebCorpus:
+    """
+    Persistent web search corpus shared by every session.
+    Chunks of the fetched pages are upserted into one collection per chunk size that is never
+    recreated, the fetch time of every page and the number of times its chunks were retrieved
+    are tracked in the cache database. Pages fetched within max_age are not fetched or embedded
+    again, the chunks of pages fetched before are replaced when they are indexed again and
+    compaction evicts the chunks of stale pages and of pages rarely retrieved since they
+    were fetched.
+    Args:
+        chunk_size (int): Chunk size of the web pages in the collection
+    """
+
+    def __init__(self, chunk_size: int):
+        self.collection_name = corpus_collection(chunk_size)
+        self.vectordb = get_vectordb()
+        self.vectordb.create_collection(self.collection_name, recreate=False)
+        os.makedirs(os.path.dirname(cache_config["path"]) or ".", exist_ok=True)
+        self.lock = Lock()
+        self.connection = sqlite3.connect(
+            cache_config["path"], check_same_thread=False, timeout=30
+        )
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS corpus_pages "
+                "(collection TEXT, url TEXT, page_url TEXT, fetched_at REAL, hits INTEGER, "
+                "last_hit REAL, PRIMARY KEY (collection, url))"
+            )
+
+    def split_fresh(self, urls: List[str]) -> Tuple[Set[str], List[str]]:
+        """
+        Splits the urls by the age of their pages in the corpus.
+        Returns:
+            Tuple[Set[str], List[str]]: The urls indexed within max_age, and the urls stored in
+                the chunks of the pages indexed before it
+        """
+        now = time.time()
+        fresh: Set[str] = set()
+        stale: List[str] = []
+        with self.lock, self.connection:
+            for url in urls:
+                row = self.connection.execute(
+                    "SELECT page_url, fetched_at FROM corpus_pages "
+                    "WHERE collection = ? AND url = ?",
+                    (self.collection_name, canonicalize_url(url)),
+                ).fetchone()
+                if row is None:
+                    continue
+                if now - row[1] < corpus_config["max_age"]:
+                    fresh.add(url)
+                else:
+                    stale.append(row[0])
+        return fresh, stale
+
+    def page_urls(self, urls: List[str]) -> List[str]:
+        """
+        Urls stored in the chunks of the corpus pages of the urls.
+        """
+        with self.lock, self.connection:
+            return [
+                row[0]
+                for url in urls
+                if (
+                    row := self.connection.execute(
+                        "SELECT page_url FROM corpus_pages WHERE collection = ? AND url = ?",
+                        (self.collection_name, canonicalize_url(url)),
+                    ).fetchone()
+                )
+                is not None
+            ]
+
+    def add(self, urls: Iterable[str]):
+        """
+        Records the pages as indexed now, keeping their retrieval counts.
+        Pages are keyed by canonical url, the url stored in the chunks is kept for eviction.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO corpus_pages VALUES (?, ?, ?, ?, 0, NULL) "
+                "ON CONFLICT (collection, url) DO UPDATE SET "
+                "page_url = excluded.page_url, fetched_at = excluded.fetched_at",
+                [
+                    (self.collection_name, canonicalize_url(url), url, now)
+                    for url in urls
+                ],
+            )
+
+    def record_hits(self, urls: Iterable[str]):
+        """
+        Counts a retrieval of each page.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "UPDATE corpus_pages SET hits = hits + 1, last_hit = ? "
+                "WHERE collection = ? AND url = ?",
+                [(now, self.collection_name, canonicalize_url(url)) for url in urls],
+            )
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Pages of the corpus collection and the fraction of them retrieved at least once.
+        """
+        with self.lock, self.connection:
+            pages, hit = self.connection.execute(
+                "SELECT COUNT(*), COUNT(last_hit) FROM corpus_pages WHERE collection = ?",
+                (self.collection_name,),
+            ).fetchone()
+        return {"pages": pages, "hit_pages": hit / pages if pages else 0.0}
+
+    def compact(self) -> int:
+        """
+        Deletes the chunks of the pages fetched more than max_age ago and of the pages fetched
+        more than the compaction grace ago with fewer than min_hits retrievals, in every corpus
+        collection. Collections of older corpus versions are deleted.
+        Returns:
+            int: Number of evicted pages
+        """
+        compaction = corpus_config["compaction"]
+        now = time.time()
+        for collection_name in self.vectordb.get_collections():
+            if collection_name.startswith(
+                f"{COLLECTION_PREFIX}-v"
+            ) and not collection_name.startswith(
+                f"{COLLECTION_PREFIX}-v{corpus_config['version']}-"
+            ):
+                self.vectordb.delete_collection(collection_name)
+                with self.lock, self.connection:
+                    self.connection.execute(
+                        "DELETE FROM corpus_pages WHERE collection = ?",
+                        (collection_name,),
+                    )
+                logger.info(f"Deleted outdated web corpus {collection_name}")
+
+        with self.lock, self.connection:
+            rows = self.connection.execute(
+                "SELECT collection, url, page_url FROM corpus_pages "
+                "WHERE fetched_at < ? OR (fetched_at < ? AND hits < ?)",
+                (
+                    now - corpus_config["max_age"],
+                    now - compaction["grace"],
+                    compaction["min_hits"],
+                ),
+            ).fetchall()
+        stale: Dict[str, List[Tuple[str, str]]] = {}
+        for collection_name, url, page_url in rows:
+            stale.setdefault(collection_name, []).append((url, page_url))
+        for collection_name, pages in stale.items():
+            self.vectordb.delete_documents(
+                collection_name, [page_url for _, page_url in pages]
+            )
+            with self.lock, self.connection:
+                self.connection.executemany(
+                    "DELETE FROM corpus_pages WHERE collection = ? AND url = ?",
+                    [(collection_name, url) for url, _ in pages],
+                )
+        if rows:
+            logger.info(f"Evicted {len(rows)} stale pages from the web corpus")
+        return len(rows)
+
+
+_web_corpora: Dict[int, WebCorpus] = {}
+_web_corpus_lock = Lock()
+_compaction_thread: Optional[Thread] = None
+_compaction_stop = Event()
+
+
+def compact_web_corpus(corpus: WebCorpus):
+    """
+    Compacts the web corpus every compaction interval until the corpus is closed.
+    """
+    while not _compaction_stop.wait(corpus_config["compaction"]["interval"]):
+        try:
+            corpus.compact()
+        except Exception as e:
+            logger.warning(f"Web corpus compaction failed: {e}")
+
+
+def get_web_corpus(chunk_size: int) -> WebCorpus:
+    """
+    Returns the process wide web corpus of the chunk size, created on first use.
+    The background compaction of every corpus collection starts with the first corpus.
+    """
+    global _compaction_thread
+    with _web_corpus_lock:
+        if chunk_size not in _web_corpora:
+            _web_corpora[chunk_size] = WebCorpus(chunk_size)
+        if _compaction_thread is None:
+            _compaction_stop.clear()
+            _compaction_thread = Thread(
+                target=compact_web_corpus,
+                args=(_web_corpora[chunk_size],),
+                name="corpus-compaction",
+                daemon=True,
+            )
+            _compaction_thread.start()
+        return _web_corpora[chunk_size]
+
+
+def close_web_corpus():
+    global _compaction_thread
+    with _web_corpus_lock:
+        if _compaction_thread is not None:
+            _compaction_stop.set()
+            _compaction_thread.join()
+            _compaction_thread = None
+        for corpus in _web_corpora.values():
+            corpus.connection.close()
+        _web_corpora.clear()
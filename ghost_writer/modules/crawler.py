@@ -0,0 +1,331 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Future
+from threading import Lock, Thread
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import psutil
+import yaml
+from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, CrawlResult
+
+from ghost_writer.modules.scheduler import get_host, get_host_scheduler
+from ghost_writer.utils.logger import logger
+
+crawl_config = yaml.safe_load(open("config/ghost_writer.yaml", "r"))[
+    "knowledge_builder"
+]["search"]["crawl"]
+
+
+def rss_mb() -> float:
+    """
+    Resident memory in MB of this process and its children, the browser processes included.
+    """
+    process = psutil.Process()
+    rss = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            rss += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return rss / 2**20
+
+
+class CrawlerPool:
+    """
+    Long-lived headless browser shared by the web searches of every session.
+    The AsyncWebCrawler runs on a dedicated event loop thread, it is started on the first crawl
+    and kept open so later crawls reuse the running browser and its contexts.
+    Synchronous callers submit crawls from any thread and wait on the returned future.
+    The urls of a crawl run concurrently within the per-host limits of the host scheduler, at
+    most crawl.concurrency pages are open across all crawls and no new page is opened while the
+    resident memory is above crawl.max_rss_mb unless none is open. Each page is bounded by
+    crawl.page_timeout, its timing and outcome are recorded for tuning.
+    Timeouts and unsuccessful pages leave the browser running, it is replaced after
+    crawl.max_failures consecutive crawls raised across every session. The replaced browser is
+    closed once no crawl still holds it.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, name="crawler", daemon=True)
+        self.thread.start()
+        self.crawler: Optional[AsyncWebCrawler] = None
+        self.scheduler = get_host_scheduler()
+        self.start_lock = asyncio.Lock()
+        self.lock = Lock()
+        self.browser_starts = 0
+        self.crawls = 0
+        self.crawl_time = 0.0
+        self.active = 0
+        self.throttled = 0
+        self.peak_rss = 0.0
+        self.pages: Deque[Dict[str, Any]] = deque(maxlen=1000)
+        self.outcomes = {"ok": 0, "failed": 0, "timeout": 0}
+        self.failures = 0
+        self.holders: Dict[int, int] = {}
+
+    async def get_crawler(self) -> AsyncWebCrawler:
+        async with self.start_lock:
+            if self.crawler is None:
+                crawler = AsyncWebCrawler(headless=True)
+                await crawler.start()
+                self.crawler = crawler
+                with self.lock:
+                    self.browser_starts += 1
+                logger.info(f"Started crawler browser ({self.browser_starts} starts)")
+        return self.crawler
+
+    async def acquire(self) -> AsyncWebCrawler:
+        crawler = await self.get_crawler()
+        self.holders[id(crawler)] = self.holders.get(id(crawler), 0) + 1
+        return crawler
+
+    async def release(self, crawler: AsyncWebCrawler):
+        """
+        Releases a crawl's hold on the browser and closes it if it was retired and this was
+        the last crawl holding it.
+        """
+        self.holders[id(crawler)] -= 1
+        if self.holders[id(crawler)] == 0:
+            del self.holders[id(crawler)]
+            if crawler is not self.crawler:
+                await self.discard(crawler)
+
+    async def retire(self, crawler: AsyncWebCrawler):
+        """
+        Stops handing out a failing browser, the next crawl starts a new one. The crawls still
+        running on it finish and the last of them closes it.
+        """
+        async with self.start_lock:
+            if self.crawler is crawler:
+                self.crawler = None
+                logger.warning(
+                    f"{crawl_config['max_failures']} consecutive crawls failed, "
+                    "restarting browser"
+                )
+
+    async def discard(self, crawler: AsyncWebCrawler):
+        """
+        Closes a browser, the current one is dropped first so the next crawl starts a new one.
+        """
+        async with self.start_lock:
+            if self.crawler is crawler:
+                self.crawler = None
+        try:
+            await crawler.close()
+        except Exception as e:
+            logger.warning(f"Failed to close crawler browser: {e}")
+
+    async def dispatch(self):
+        """
+        Waits on the crawler loop until a page may be opened within the concurrency and memory
+        limits and takes its slot.
+        """
+        throttled = False
+        while True:
+            if self.active < crawl_config["concurrency"]:
+                rss = rss_mb() if self.active else 0.0
+                if rss < crawl_config["max_rss_mb"]:
+                    self.active += 1
+                    with self.lock:
+                        self.peak_rss = max(self.peak_rss, rss)
+                    return
+                if not throttled:
+                    throttled = True
+                    with self.lock:
+                        self.throttled += 1
+                    logger.warning(
+                        f"Crawler throttled at {rss:.0f}MB resident memory, "
+                        f"{self.active} pages open"
+                    )
+            await asyncio.sleep(0.1)
+
+    async def crawl_url(
+        self,
+        crawler: AsyncWebCrawler,
+        url: str,
+        config: CrawlerRunConfig,
+        **kwargs: Any,
+    ) -> Optional[CrawlResult]:
+        """
+        Crawls one url within the host, concurrency and memory limits.
+        Returns:
+            Optional[CrawlResult]: The result of the crawl, None if it timed out or raised
+        """
+        host = get_host(url)
+        queued = time.perf_counter()
+        async with self.scheduler.async_slot(host):
+            await self.dispatch()
+            start = time.perf_counter()
+            outcome = "failed"
+            try:
+                result = await asyncio.wait_for(
+                    crawler.arun(url=url, config=config, **kwargs),  # type: ignore
+                    crawl_config["page_timeout"],
+                )
+                outcome = "ok" if getattr(result, "success", True) else "failed"
+                self.failures = 0
+                return result
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                logger.warning(
+                    f"Crawl of {url} timed out after {crawl_config['page_timeout']}s"
+                )
+                return None
+            except Exception as e:
+                logger.warning(f"Crawl of {url} failed: {e}")
+                self.failures += 1
+                if self.failures >= crawl_config["max_failures"]:
+                    self.failures = 0
+                    await self.retire(crawler)
+                return None
+            finally:
+                self.active -= 1
+                self.record(url, outcome, start - queued, time.perf_counter() - start)
+
+    def record(self, url: str, outcome: str, wait: float, elapsed: float):
+        with self.lock:
+            self.outcomes[outcome] += 1
+            self.pages.append(
+                {"url": url, "outcome": outcome, "wait": wait, "time": elapsed}
+            )
+
+    async def _crawl(
+        self,
+        urls: List[str],
+        config: CrawlerRunConfig,
+        on_result: Optional[Callable[[int, CrawlResult], Any]] = None,
+        **kwargs: Any,
+    ) -> List[Optional[CrawlResult]]:
+        """
+        Crawls the urls concurrently, each waiting for a slot of its host in the scheduler.
+        on_result is called on the crawler loop with the index and result of each url as soon as
+        its crawl completes, it must not block.
+        A url that times out or raises yields None and is recorded in the page stats.
+        """
+        crawler = await self.acquire()
+        start = time.perf_counter()
+
+        async def crawl_one(idx: int, url: str) -> Optional[CrawlResult]:
+            result = await self.crawl_url(crawler, url, config, **kwargs)
+            if result is not None and on_result is not None:
+                on_result(idx, result)
+            return result
+
+        try:
+            results = await asyncio.gather(
+                *(crawl_one(idx, url) for idx, url in enumerate(urls)),
+                return_exceptions=True,
+            )
+        finally:
+            await self.release(crawler)
+        results = [
+            None if isinstance(result, BaseException) else result for result in results
+        ]
+        with self.lock:
+            self.crawls += 1
+            self.crawl_time += time.perf_counter() - start
+        return results
+
+    def submit(
+        self,
+        urls: List[str],
+        config: CrawlerRunConfig,
+        on_result: Optional[Callable[[int, CrawlResult], Any]] = None,
+        **kwargs: Any,
+    ) -> Future:
+        """
+        Schedules a crawl of the urls on the crawler loop, safe to call from any thread.
+        See _crawl for on_result.
+        Returns:
+            Future: Resolves to the list of CrawlResult in the order of the urls, None for the
+                urls that failed
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._crawl(urls, config, on_result, **kwargs), self.loop
+        )
+
+    def crawl(
+        self,
+        urls: List[str],
+        config: CrawlerRunConfig,
+        on_result: Optional[Callable[[int, CrawlResult], Any]] = None,
+        **kwargs: Any,
+    ) -> List[Optional[CrawlResult]]:
+        return self.submit(urls, config, on_result, **kwargs).result()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Browser starts, crawls and their average time, the outcomes of the pages, the number of
+        times the dispatcher throttled on memory and the peak resident memory in MB seen by it.
+        """
+        with self.lock:
+            return {
+                "browser_starts": self.browser_starts,
+                "crawls": self.crawls,
+                "avg_crawl_time": self.crawl_time / self.crawls if self.crawls else 0.0,
+                "pages": dict(self.outcomes),
+                "throttled": self.throttled,
+                "peak_rss_mb": self.peak_rss,
+            }
+
+    def page_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Outcomes and average wait and crawl time in seconds of the recent pages of each host.
+        Returns:
+            Dict[str, Dict[str, float]]: The stats of each host, slowest hosts first
+        """
+        with self.lock:
+            pages = list(self.pages)
+        hosts: Dict[str, Dict[str, float]] = {}
+        for page in pages:
+            host = hosts.setdefault(
+                get_host(page["url"]),
+                {"ok": 0, "failed": 0, "timeout": 0, "wait": 0.0, "time": 0.0},
+            )
+            host[page["outcome"]] += 1
+            host["wait"] += page["wait"]
+            host["time"] += page["time"]
+        for host in hosts.values():
+            count = host["ok"] + host["failed"] + host["timeout"]
+            host["wait"] /= count
+            host["time"] /= count
+        return dict(
+            sorted(hosts.items(), key=lambda item: item[1]["time"], reverse=True)
+        )
+
+    def close(self):
+        """
+        Closes the browser and stops the crawler loop.
+        """
+        if self.crawler is not None:
+            asyncio.run_coroutine_threadsafe(
+                self.discard(self.crawler), self.loop
+            ).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+_crawler_pool: Optional[CrawlerPool] = None
+_crawler_pool_lock = Lock()
+
+
+def get_crawler_pool() -> CrawlerPool:
+    """
+    Returns the process wide crawler pool, created on first use.
+    """
+    global _crawler_pool
+    with _crawler_pool_lock:
+        if _crawler_pool is None:
+            _crawler_pool = CrawlerPool()
+        return _crawler_pool
+
+
+def close_crawler_pool():
+    global _crawler_pool
+    with _crawler_pool_lock:
+        if _crawler_pool is not None:
+            _crawler_pool.close()
+            _crawler_pool = None
@@ -0,0 +1,341 @@
+import re
+import time
+from collections import defaultdict, deque
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from queue import Empty, SimpleQueue
+from threading import Lock
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+import yaml
+from crawl4ai import CrawlerRunConfig, CrawlResult
+from trafilatura import extract
+
+from ghost_writer.modules.crawler import get_crawler_pool
+from ghost_writer.modules.scheduler import get_host, get_host_scheduler
+from ghost_writer.utils.cache import DiskCache
+from ghost_writer.utils.logger import logger
+from ghost_writer.utils.processes import get_process_context
+
+config = yaml.safe_load(open("config/ghost_writer.yaml", "r"))
+fetch_config = config["knowledge_builder"]["search"]["fetch"]
+page_cache_config = config["cache"]["pages"]
+
+SPA_SHELL = re.compile(
+    r"<div[^>]+id=[\"'](?:root|app|__next|__nuxt)[\"'][^>]*>\s*</div>",
+    re.IGNORECASE,
+)
+
+
+def extract_text(html: Optional[str]) -> Optional[str]:
+    """
+    Extracts the plain text of a page with tables and comments removed.
+    """
+    if not html:
+        return None
+    return extract(
+        html,
+        include_tables=False,
+        include_comments=False,
+        output_format="txt",
+    )
+
+
+def timed_extract_text(html: Optional[str]) -> Tuple[Optional[str], float]:
+    """
+    extract_text in a worker process, along with the seconds it took.
+    """
+    start = time.perf_counter()
+    return extract_text(html), time.perf_counter() - start
+
+
+def is_spa_shell(html: str) -> bool:
+    """
+    Whether the page is a client side rendered shell whose app mounts into an empty root element.
+    """
+    return bool(SPA_SHELL.search(html))
+
+
+class WebFetcher:
+    """
+    Tiered page fetcher for web search results.
+    Pages still fresh in the page cache are served without a request, cached pages past their
+    freshness are revalidated with a conditional GET. The others are fetched with a pooled
+    HTTP/2 client and extracted with trafilatura, only the pages whose extracted text is shorter
+    than the word count threshold, that are empty client side rendered shells or that fail to
+    download are crawled with the shared browser.
+    Text extraction runs in a process pool off the fetch threads and the crawler loop, the
+    pages crawled by the browser are submitted as soon as each crawl completes, see
+    get_process_context for how the workers are started.
+    Hit counts and latencies are recorded per tier, along with the extraction throughput
+    measured over the time the pool had pages in flight.
+    """
+
+    def __init__(self):
+        self.client = httpx.Client(
+            http2=True,
+            follow_redirects=True,
+            timeout=fetch_config["timeout"],
+            limits=httpx.Limits(max_connections=fetch_config["max_connections"]),
+            headers={"User-Agent": fetch_config["user_agent"]},
+        )
+        self.extract_pool = ProcessPoolExecutor(
+            fetch_config["extract_workers"],
+            mp_context=get_process_context(),
+        )
+        self.crawler_pool = get_crawler_pool()
+        self.scheduler = get_host_scheduler()
+        self.lock = Lock()
+        self.extracted = 0
+        self.extract_time = 0.0
+        self.in_flight = 0
+        self.busy_since = 0.0
+        self.busy_time = 0.0
+        self.hits = {"cache": 0, "revalidated": 0, "http": 0, "browser": 0, "failed": 0}
+        self.latencies: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=1000)
+        )
+
+    def record(self, tier: str, hits: int, latency: Optional[float] = None):
+        with self.lock:
+            self.hits[tier] += hits
+            if latency is not None:
+                self.latencies[tier].append(latency)
+
+    def extract(self, html: Optional[str]) -> Future:
+        """
+        Submits the extraction of a page to the process pool without waiting for it.
+        Returns:
+            Future: Resolves to the extracted text, None if nothing could be extracted
+        """
+        result: Future = Future()
+
+        def done(future: Future):
+            with self.lock:
+                self.in_flight -= 1
+                if not self.in_flight:
+                    self.busy_time += time.perf_counter() - self.busy_since
+            try:
+                text, elapsed = future.result()
+            except Exception as e:
+                logger.warning(f"Text extraction failed: {e}")
+                result.set_result(None)
+                return
+            with self.lock:
+                self.extracted += 1
+                self.extract_time += elapsed
+            result.set_result(text)
+
+        with self.lock:
+            if not self.in_flight:
+                self.busy_since = time.perf_counter()
+            self.in_flight += 1
+        self.extract_pool.submit(timed_extract_text, html).add_done_callback(done)
+        return result
+
+    def fetch_http(self, url: str, cached: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Fetches and extracts a page over HTTP, sending the validators of the cached page.
+        Args:
+            url (str): Url of the page
+            cached (Optional[Dict]): Page cache entry of the url
+
+        Returns:
+            Optional[Dict]: Page entry with the "text", "etag", "last_modified" and "fetched_at"
+                of the page, None if it has to be escalated to the browser
+        """
+        start = time.perf_counter()
+        headers = {}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            with self.scheduler.slot(get_host(url)):
+                response = self.client.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            logger.debug(f"HTTP fetch failed for {url}: {e}")
+            return None
+        if response.status_code == 304 and cached:
+            self.record("revalidated", 1, time.perf_counter() - start)
+            return cached | {"fetched_at": time.time()}
+        if response.status_code != 200 or "html" not in response.headers.get(
+            "content-type", ""
+        ):
+            return None
+        text = self.extract(response.text).result()
+        if (
+            not text
+            or len(text.split()) < fetch_config["word_count_threshold"]
+            or is_spa_shell(response.text)
+        ):
+            return None
+        self.record("http", 1, time.perf_counter() - start)
+        return {
+            "text": text,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "fetched_at": time.time(),
+        }
+
+    def fetch(
+        self,
+        urls: List[str],
+        config: CrawlerRunConfig,
+        cache: Optional[DiskCache] = None,
+        on_page: Optional[Callable[[int, str], Any]] = None,
+        **kwargs,
+    ) -> List[str]:
+        """
+        Fetches the text of every url, escalating to the browser crawler when needed.
+        Args:
+            urls (List[str]): Urls of the pages
+            config (CrawlerRunConfig): Run configuration of the browser crawl
+            cache (Optional[DiskCache]): Page cache mapping urls to their page entries
+            on_page (Optional[Callable[[int, str], Any]]): Called on the calling thread with the
+                index and text of each page as soon as it is extracted, it may block to apply
+                backpressure to the fetch
+            **kwargs: Additional arguments of the browser crawl
+
+        Returns:
+            List[str]: The extracted text of each url, "No Results" if none could be extracted
+        """
+        now = time.time()
+        cached = [cache.get(url) if cache else None for url in urls]
+        pages: List[Optional[Dict]] = [
+            entry
+            if entry and now - entry["fetched_at"] < page_cache_config["fresh"]
+            else None
+            for entry in cached
+        ]
+        self.record("cache", sum(page is not None for page in pages))
+
+        def deliver(idx: int, page: Optional[Dict], store: bool = True):
+            pages[idx] = page
+            if page and cache and store:
+                cache.set(urls[idx], page)
+            if page and on_page is not None:
+                on_page(idx, page["text"])
+
+        for idx, page in enumerate(pages):
+            if page is not None:
+                deliver(idx, page, store=False)
+
+        pending = [idx for idx, page in enumerate(pages) if page is None]
+        if fetch_config["http"] and pending:
+            with ThreadPoolExecutor(
+                min(len(pending), fetch_config["max_connections"])
+            ) as executor:
+                futures = {
+                    executor.submit(self.fetch_http, urls[idx], cached[idx]): idx
+                    for idx in pending
+                }
+                for future in as_completed(futures):
+                    deliver(futures[future], future.result())
+
+        escalated = [idx for idx, page in enumerate(pages) if page is None]
+        if escalated:
+            start = time.perf_counter()
+            arrivals: SimpleQueue = SimpleQueue()
+
+            def on_result(position: int, result: CrawlResult):
+                if result.html:
+                    arrivals.put((escalated[position], self.extract(result.html)))
+
+            crawl = self.crawler_pool.submit(
+                [urls[idx] for idx in escalated], config, on_result, **kwargs
+            )
+            crawled = 0
+            while True:
+                try:
+                    idx, extraction = arrivals.get(timeout=0.05)
+                except Empty:
+                    if crawl.done() and arrivals.empty():
+                        break
+                    continue
+                text = extraction.result()
+                if text:
+                    deliver(
+                        idx,
+                        {
+                            "text": text,
+                            "etag": None,
+                            "last_modified": None,
+                            "fetched_at": time.time(),
+                        },
+                    )
+                    crawled += 1
+            try:
+                crawl.result()
+            except Exception as e:
+                logger.warning(f"Browser crawl failed: {e}")
+            self.record("browser", crawled, time.perf_counter() - start)
+            self.record("failed", len(escalated) - crawled)
+
+        return [page["text"] if page else "No Results" for page in pages]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Hit rate and latency percentiles in seconds of each tier, and the pages extracted with
+        their average extraction time and the pages extracted per second the pool was busy.
+        """
+        with self.lock:
+            total = sum(self.hits.values())
+            stats = {}
+            for tier, hits in self.hits.items():
+                latencies = np.asarray(self.latencies[tier], dtype=np.float64)
+                stats[tier] = {
+                    "hits": hits,
+                    "hit_rate": hits / total if total else 0.0,
+                }
+                if latencies.size:
+                    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+                    stats[tier] |= {
+                        "p50": float(p50),
+                        "p90": float(p90),
+                        "p99": float(p99),
+                    }
+            busy_time = self.busy_time + (
+                time.perf_counter() - self.busy_since if self.in_flight else 0.0
+            )
+            stats["extract"] = {
+                "pages": self.extracted,
+                "avg_time": self.extract_time / self.extracted
+                if self.extracted
+                else 0.0,
+                "pages_per_sec": self.extracted / busy_time if busy_time else 0.0,
+            }
+            return stats
+
+    def close(self):
+        self.client.close()
+        self.extract_pool.shutdown(cancel_futures=True)
+
+
+_web_fetcher: Optional[WebFetcher] = None
+_web_fetcher_lock = Lock()
+
+
+def get_web_fetcher() -> WebFetcher:
+    """
+    Returns the process wide web fetcher, created on first use.
+    """
+    global _web_fetcher
+    with _web_fetcher_lock:
+        if _web_fetcher is None:
+            _web_fetcher = WebFetcher()
+        return _web_fetcher
+
+
+def close_web_fetcher():
+    global _web_fetcher
+    with _web_fetcher_lock:
+        if _web_fetcher is not None:
+            _web_fetcher.close()
+            _web_fetcher = None
@@ -1,20 +1,137 @@
+import hashlib
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, List, Type, TypeVar, Union
-
-import pymupdf4llm as pymupdf
+import resource
+import sys
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from itertools import islice
+from threading import Lock
+from typing import Dict, List, Optional, Tuple, Type, TypeVar, Union
+
+import numpy as np
+import pymupdf
+import pymupdf4llm
 import yaml
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from pydantic import BaseModel
 
 from ghost_writer.modules.search import GoogleWeb
-from ghost_writer.modules.vectordb import Qdrant
+from ghost_writer.modules.vectordb import get_vectordb, session_collection
+from ghost_writer.utils.cache import DiskCache
+from ghost_writer.utils.logger import logger
+from ghost_writer.utils.processes import get_process_context
 from ghost_writer.utils.prompt import Prompt
+from ghost_writer.utils.text_splitter import RecursiveTextSplitter
 from llms.basellm import LLM, StructLLM
 
 T = TypeVar("T", bound=BaseModel)
 
 provider_config = yaml.safe_load(open("config/llms.yaml", "r"))
+config = yaml.safe_load(open("config/ghost_writer.yaml", "r"))
+loader_config = config["knowledge_builder"]["portfolio"]["loader"]
+research_config = config["knowledge_builder"]["research"]
+pipeline_config = config["knowledge_builder"]["search"]["pipeline"]
+cache_config = config["cache"]
+
+
+def load_pages(path: str, pages: Optional[List[int]] = None) -> str:
+    """
+    Converts a document, or the given pages of it, to markdown.
+    Defined at module level so that it can run in a process pool.
+    """
+    return pymupdf4llm.to_markdown(path, pages=pages)  # type: ignore
+
+
+def count_pages(path: str) -> int:
+    with pymupdf.open(path) as doc:
+        return doc.page_count
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident memory of this process in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def load_pages_in_worker(
+    path: str, pages: Optional[List[int]] = None
+) -> Tuple[str, float]:
+    """
+    load_pages in a worker process, along with the peak resident memory of the worker in MB.
+    """
+    return load_pages(path, pages), peak_rss_mb()
+
+
+def convert_documents(paths: List[str]) -> Tuple[List[str], float]:
+    """
+    Converts documents to markdown. Documents longer than the configured number of pages per
+    task are split into page ranges that are converted in parallel in a process pool and merged
+    back in page order, see get_process_context. The wall time and peak resident memory of the conversion are logged.
+    Args:
+        paths (List[str]): Paths of the documents
+
+    Returns:
+        Tuple[List[str], float]: The markdown of each document, and the peak resident memory in
+            MB of the largest worker, of this process when converted inline
+    """
+    start = time.perf_counter()
+    pages_per_task = loader_config["pages_per_task"]
+    tasks = []  # (path index, page range)
+    total_pages = 0
+    for idx, path in enumerate(paths):
+        page_count = count_pages(path)
+        total_pages += page_count
+        if page_count <= pages_per_task:
+            tasks.append((idx, None))
+        else:
+            tasks.extend(
+                (idx, list(range(first, min(first + pages_per_task, page_count))))
+                for first in range(0, page_count, pages_per_task)
+            )
+
+    if len(tasks) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(loader_config["workers"], len(tasks)),
+            mp_context=get_process_context(),
+        ) as executor:
+            results = list(
+                executor.map(
+                    load_pages_in_worker,
+                    [paths[idx] for idx, _ in tasks],
+                    [pages for _, pages in tasks],
+                )
+            )
+        parts = [part for part, _ in results]
+        peak_rss = max(rss for _, rss in results)
+    else:
+        parts = [load_pages(paths[idx], pages) for idx, pages in tasks]
+        peak_rss = peak_rss_mb()
+
+    documents = [""] * len(paths)
+    for (idx, _), part in zip(tasks, parts):
+        documents[idx] += part
+    logger.info(
+        f"Loaded {len(paths)} files ({total_pages} pages) in "
+        f"{time.perf_counter() - start:.2f}s, peak RSS {peak_rss:.0f}MB"
+    )
+    return documents, peak_rss
+
+
+def source_key(item: str) -> str:
+    """
+    Content key of a source, the sha256 of the file bytes or of the raw text.
+    """
+    if os.path.isfile(item):
+        with open(item, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    return hashlib.sha256(item.encode("utf-8")).hexdigest()
 
 
 class KnowledgeBaseBuilder:
@@ -33,6 +150,7 @@ class KnowledgeBaseBuilder:
         portfolio_chunk_overlap (int): Overlap between text chunks for portfolio documents
         webpage_chunk_size (int), optional: Size of text chunks for processing web content defaults to 1000
         webpage_chunk_overlap (int), optional: Overlap between text chunks for web content defaults to 0
+        session_id (str), optional: Session that owns the collections, scopes the collection names when set
     """
 
     def __init__(
@@ -46,6 +164,7 @@ class KnowledgeBaseBuilder:
         portfolio_chunk_overlap: int,
         webpage_chunk_size: int = 1000,
         webpage_chunk_overlap: int = 0,
+        session_id: Optional[str] = None,
     ):
         self.struct_llm = StructLLM(
             provider=provider_config["structllm"]["provider"],
@@ -56,36 +175,41 @@ class KnowledgeBaseBuilder:
             model=provider_config["llm"]["model"],
         )
         self.model = model
-        self.vectordb = Qdrant()
-        self.collection_name = source_name
+        self.vectordb = get_vectordb()
+        self.collection_name = session_collection(source_name, session_id)
         self.vectordb.create_collection(self.collection_name)
         self.retrieval_limit = retrieval_limit
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.section_usage = {"calls": 0, "tokens": 0}
+        self.usage_lock = Lock()
+        self.text_splitter = RecursiveTextSplitter(
             chunk_size=portfolio_chunk_size,
             chunk_overlap=portfolio_chunk_overlap,
-            length_function=len,
-            is_separator_regex=False,
-            separators=[
-                "\n\n",
-                "\n",
-                ".",
-                "\uff0e",
-                "\u3002",
-                ",",
-                "\uff0c",
-                "\u3001",
-                " ",
-                "\u200b",
-                "",
-            ],
         )
-        self.source = self.load_files(source)
+        self.document_cache = DiskCache(
+            cache_config["path"],
+            "documents",
+            ttl=cache_config["documents"]["ttl"],
+            max_entries=cache_config["documents"]["max_entries"],
+        )
+        self.knowledge_cache = DiskCache(
+            cache_config["path"],
+            "knowledge",
+            ttl=cache_config["knowledge"]["ttl"],
+            max_entries=cache_config["knowledge"]["max_entries"],
+        )
+        sources = [source] if isinstance(source, str) else source
+        self.source_keys = [source_key(item) for item in sources]
+        self.source = self.load_files(sources)
         if research:
-            self.search = GoogleWeb(webpage_chunk_size, webpage_chunk_overlap)
+            self.search = GoogleWeb(
+                webpage_chunk_size, webpage_chunk_overlap, session_id=session_id
+            )
 
     def load_files(self, items: Union[str, List[str]]) -> List[str]:
         """
         Load and process multiple files or text items into strings.
+        Parsed files are served from the document cache keyed on the sha256 of the file bytes
+        and the parser version, the others are converted with convert_documents.
         Args:
             items (Union[str, List[str]]): File path(s) or text content to load.
 
@@ -93,36 +217,52 @@ class KnowledgeBaseBuilder:
             List[str]: List of processed docs in string.
         """
 
-        def load_file(path: str):
-            md = pymupdf.to_markdown(path)  # type: ignore
-            return md
-
         if isinstance(items, str):
-            if os.path.isfile(items):
-                return [load_file(items)]
-            else:
-                return [items]
-        elif isinstance(items, list):
-            results = []
-            for item in items:
-                results.extend(self.load_files(item))
-            return results
-
-    def structured_document(self, prompt: Prompt):
+            items = [items]
+
+        results = list(items)
+        keys: Dict[int, str] = {}
+        for idx, item in enumerate(items):
+            if not os.path.isfile(item):
+                continue
+            keys[idx] = f"{source_key(item)}:pymupdf4llm-{pymupdf4llm.__version__}"
+            cached = self.document_cache.get(keys[idx])
+            if cached is not None:
+                results[idx] = cached
+                del keys[idx]
+
+        if keys:
+            documents, _ = convert_documents([items[idx] for idx in keys])
+            for idx, document in zip(keys, documents):
+                results[idx] = document
+                self.document_cache.set(keys[idx], document)
+        return results
+
+    def structured_document(self, prompt: Prompt, cache_key: Optional[str] = None):
         """
         Generates a structured document based on the provided prompt using a language model.
         Args:
             prompt (Prompt): The prompt object containing the text to be structured.
+            cache_key (str, optional): Source key of the document, when given the structured
+                document is cached alongside the parsed source and reused on re-upload.
 
         Returns:
             str: The structured response from the language model following the specified format.
 
         """
 
+        if cache_key:
+            cache_key = f"{cache_key}:{self.model.__name__}:{self.struct_llm.model}"
+            cached = self.document_cache.get(cache_key)
+            if cached is not None:
+                return self.model.model_validate(cached)
+
         response = self.struct_llm(
             prompt=str(prompt),
             format=self.model,
         )
+        if cache_key:
+            self.document_cache.set(cache_key, response.model_dump())
         return response
 
     def query_vectordb(self, queries: List[str]):
@@ -138,10 +278,10 @@ class KnowledgeBaseBuilder:
         """
 
         result_list = []
-        for query in queries:
-            results = self.vectordb.query_documents(
-                self.collection_name, query, limit=self.retrieval_limit
-            )
+        query_results = self.vectordb.query_many(
+            self.collection_name, queries, limit=self.retrieval_limit
+        )
+        for query, results in zip(queries, query_results):
             result_list.append(
                 {
                     "query": query,
@@ -155,57 +295,62 @@ class KnowledgeBaseBuilder:
 
         return result_list
 
-    def split_and_upload_document(self, doc):
+    def split_and_upload_document(self, doc) -> Dict[str, List]:
         """
         Splits a document into chunks and uploads them to the vector database.
+        Chunks are embedded and upserted in batches of the pipeline batch size as the splitter
+        yields them, so the first batch is embedded before the whole document is split.
         Args:
             doc (str): The document text to be split and uploaded
+
+        Returns:
+            Dict[str, List]: The uploaded chunk "docs" and their "embeddings"
         """
 
-        list_chunks = self.text_splitter.split_text(doc)
-        list_of_payloads = [{"text": chunk} for chunk in list_chunks]
-        self.vectordb.upsert_documents(self.collection_name, list_of_payloads)
+        chunks = self.text_splitter.iter_chunks(doc)
+        list_of_payloads: List[Dict[str, str]] = []
+        embeddings: List[List[float]] = []
+        while batch := list(islice(chunks, pipeline_config["batch_size"])):
+            payloads = [{"text": chunk} for chunk in batch]
+            batch_embeddings = self.vectordb.get_embeddings(batch)
+            self.vectordb.upsert_documents(
+                self.collection_name, payloads, embeddings=batch_embeddings
+            )
+            list_of_payloads.extend(payloads)
+            embeddings.extend(batch_embeddings)
+        self.knowledge_chunks = {"docs": list_of_payloads, "embeddings": embeddings}
+        return self.knowledge_chunks
 
-    def summarize_search_results(self, results: List[Dict[str, str]]):
+    def summarize_search_result(self, result: Dict[str, str]) -> Dict[str, str]:
         """
-        Summarizes search results using an LLM to generate concise overviews of web search data.
+        Summarizes the web search results of a single query.
         Args:
-            results (List[Dict[str, str]]): A list of dictionaries containing search results.
-                Each dictionary should have:
-                - "query": The search query string
-                - "result": The raw search results to be summarized
+            result (Dict[str, str]): Dictionary with the "query" and its raw search "result".
 
         Returns:
-            List[Dict[str, str]]: A list of dictionaries containing the original search data augmented with summaries.
-                Each dictionary contains:
-                - All original keys from the input dictionary
-                - "summary": The LLM-generated summary of the search results
-
+            Dict[str, str]: The input dictionary augmented with the LLM-generated "summary".
         """
 
-        summarized_results = []
-        for result in results:
-            combined_results = "\n\n".join(str(item) for item in result["result"])
-            response = self.llm(
-                str(
-                    Prompt(
-                        prompt="You are a helpful researcher. You are provided with the user query and a list of web search results.",
-                        instructions="""
-                        1. Summarize the search results into clear and concise overview that directly address the search query.
-                        2. Synthesize information from multiple results where appropriate.
-                        3. Include citations for key facts and claims. For each piece of information you present, indicate which search result(s) it came from.
-                        4. Prioritize information relevance, omit irrelevant or tangential details.
-                        5. Maintain a neutral and objective tone.
-                        6. If a source is repeated, reuse the same source number.
-                        7. The summary should be no more than 500 words followed by Sources.
-                        """,
-                        user_query=result["query"],
-                        result_list=combined_results,
-                    )
+        combined_results = "\n\n".join(str(item) for item in result["result"])
+        response = self.llm(
+            str(
+                Prompt(
+                    prompt="You are a helpful researcher. You are provided with the user query and a list of web search results.",
+                    instructions="""
+                    1. Summarize the search results into clear and concise overview that directly address the search query.
+                    2. Synthesize information from multiple results where appropriate.
+                    3. Include citations for key facts and claims. For each piece of information you present, indicate which search result(s) it came from.
+                    4. Prioritize information relevance, omit irrelevant or tangential details.
+                    5. Maintain a neutral and objective tone.
+                    6. If a source is repeated, reuse the same source number.
+                    7. The summary should be no more than 500 words followed by Sources.
+                    """,
+                    user_query=result["query"],
+                    result_list=combined_results,
                 )
             )
-            summarized_results.append({"summary": response} | result)
-        return summarized_results
+        )
+        return {"summary": response} | result
 
     def create_knowledge_document(self, gen_prompt: Prompt) -> str:
         """
@@ -237,19 +382,245 @@ class KnowledgeBaseBuilder:
         self.split_and_upload_document(self.knowledge_document)
         return self.knowledge_document
 
+    def section_llm(self, prompt: str) -> str:
+        """
+        Calls the LLM for section writing and records the prompt and completion tokens.
+        """
+
+        response = self.llm(prompt)
+        tokens = self.llm.count_tokens(prompt) + self.llm.count_tokens(response)
+        with self.usage_lock:
+            self.section_usage["calls"] += 1
+            self.section_usage["tokens"] += tokens
+        return response
+
+    @staticmethod
+    def format_search_result(item: Dict[str, str]) -> str:
+        return f"""<Query>\n{item["query"]}\n</Query>\n<Result>\n{item["summary"]}\n</Result>"""
+
+    def refine_article_section(
+        self, topic: str, search_results: List[Dict[str, str]], gen_prompt: Prompt
+    ) -> str:
+        """
+        Writes the section of a topic by refining it with the summary of each search query in turn.
+        """
+
+        document_curation = f"#{topic}\n\n"
+        for item in search_results:
+            document_curation = self.section_llm(
+                str(gen_prompt)
+                + str(
+                    Prompt(
+                        prompt="\n",
+                        section=topic,
+                        outline=document_curation,
+                        search_results=self.format_search_result(item),
+                    )
+                )
+            )
+        return document_curation
+
+    def draft_article_subsection(
+        self, topic: str, item: Dict[str, str], gen_prompt: Prompt
+    ) -> str:
+        """
+        Drafts the part of a section covered by the summary of a single search query.
+        """
+
+        return self.section_llm(
+            str(gen_prompt)
+            + str(
+                Prompt(
+                    prompt="\n",
+                    section=topic,
+                    outline=f"#{topic}\n\n",
+                    search_results=self.format_search_result(item),
+                )
+            )
+        )
+
+    def merge_article_section(self, topic: str, drafts: List[str]) -> str:
+        """
+        Merges the drafts of a section into a single section in one LLM call.
+        """
+
+        if len(drafts) == 1:
+            return drafts[0]
+        return self.section_llm(
+            str(
+                Prompt(
+                    prompt="You are an editor. You are provided with drafts of the same article section, each written from different search results.",
+                    instructions=f"""
+                    1. Merge the drafts into a single coherent section under the header #{topic}.
+                    2. Keep every relevant fact, remove repeated information.
+                    3. Keep the citations and merge the Sources of the drafts into one list, reusing the same number for a repeated source.
+                    4. Return only the section.
+                    """,
+                    section=topic,
+                    drafts="\n\n".join(
+                        f"<Draft>\n{draft}\n</Draft>" for draft in drafts
+                    ),
+                )
+            )
+        )
+
+    def plan_searches(
+        self, topics: List[Tuple[str, str]]
+    ) -> List[Tuple[str, List[str]]]:
+        """
+        Groups the topics whose search queries are near-duplicates so each group is searched once.
+        The queries are embedded in one call and greedily clustered, a query joins the first
+        cluster whose query has a cosine similarity of at least the configured threshold.
+        Args:
+            topics (List[Tuple[str, str]]): Pairs of topic and search query
+
+        Returns:
+            List[Tuple[str, List[str]]]: The search query of each cluster with the topics it serves
+        """
+        query_dedup = research_config["query_dedup"]
+        if not query_dedup["enabled"] or len(topics) < 2:
+            return [(query, [topic]) for topic, query in topics]
+
+        vectors = np.asarray(
+            self.vectordb.get_embeddings([query for _, query in topics]),
+            dtype=np.float32,
+        )
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        clusters: List[Tuple[str, List[str]]] = []
+        centers: List[int] = []
+        for idx, (topic, query) in enumerate(topics):
+            if centers:
+                similarity = vectors[centers] @ vectors[idx]
+                best = int(np.argmax(similarity))
+                if similarity[best] >= query_dedup["similarity_threshold"]:
+                    clusters[best][1].append(topic)
+                    continue
+            centers.append(idx)
+            clusters.append((query, [topic]))
+        if len(clusters) < len(topics):
+            logger.info(
+                f"Planned {len(clusters)} searches for {len(topics)} topic queries"
+            )
+        return clusters
+
+    def research(
+        self, topics: List[Tuple[str, str]], search_limit: int, gen_prompt: Prompt
+    ) -> Dict[str, str]:
+        """
+        Runs web search, summarization and section writing for all topics as a pipeline on a
+        shared thread pool bounded by the configured research concurrency.
+        Topics with near-duplicate queries share one search and its summaries, see plan_searches.
+        Every completed task immediately schedules the next stage of its topics, so searches,
+        crawls and summaries of different topics overlap and a section is written as soon as
+        all summaries of its topic are in. In map_reduce section mode each summary is drafted
+        for every topic of its search as soon as it completes and the drafts of a topic are
+        merged once all are in.
+        Args:
+            topics (List[Tuple[str, str]]): Pairs of topic and search query
+            search_limit (int): Maximum number of urls crawled per query
+            gen_prompt (Prompt): Prompt template for generating content from search results
+
+        Returns:
+            Dict[str, str]: The written section of each topic
+        """
+
+        map_reduce = research_config["section_mode"] == "map_reduce"
+        clusters = self.plan_searches(topics)
+        searches: Dict[int, List[Dict[str, str]]] = {}
+        summaries_pending: Dict[int, int] = {}
+        results: Dict[str, List[Dict[str, str]]] = {}
+        drafts: Dict[str, List[str]] = {}
+        pending: Dict[str, int] = {}
+        sections: Dict[str, str] = {}
+        with ThreadPoolExecutor(research_config["concurrency"]) as executor:
+            futures: Dict[Future, Tuple[str, Union[int, str], int]] = {
+                executor.submit(self.search.run, query=query, limit=search_limit): (
+                    "search",
+                    cluster,
+                    0,
+                )
+                for cluster, (query, _) in enumerate(clusters)
+            }
+
+            def submit_section(topic: str):
+                if map_reduce and drafts[topic]:
+                    future = executor.submit(
+                        self.merge_article_section, topic, drafts[topic]
+                    )
+                else:
+                    future = executor.submit(
+                        self.refine_article_section, topic, results[topic], gen_prompt
+                    )
+                futures[future] = ("section", topic, 0)
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, key, idx = futures.pop(future)
+                    if stage == "search":
+                        cluster = int(key)
+                        searches[cluster] = future.result()
+                        summaries_pending[cluster] = len(searches[cluster])
+                        for topic in clusters[cluster][1]:
+                            results[topic] = list(searches[cluster])
+                            drafts[topic] = [""] * len(searches[cluster])
+                            pending[topic] = len(searches[cluster])
+                            if not pending[topic]:
+                                submit_section(topic)
+                        for idx, result in enumerate(searches[cluster]):
+                            summary = executor.submit(
+                                self.summarize_search_result, result
+                            )
+                            futures[summary] = ("summarize", cluster, idx)
+                    elif stage == "summarize":
+                        cluster = int(key)
+                        summary = future.result()
+                        for topic in clusters[cluster][1]:
+                            results[topic][idx] = summary
+                            if map_reduce:
+                                draft = executor.submit(
+                                    self.draft_article_subsection,
+                                    topic,
+                                    summary,
+                                    gen_prompt,
+                                )
+                                futures[draft] = ("draft", topic, idx)
+                            else:
+                                pending[topic] -= 1
+                                if not pending[topic]:
+                                    submit_section(topic)
+                    elif stage == "draft":
+                        topic = str(key)
+                        drafts[topic][idx] = future.result()
+                        pending[topic] -= 1
+                        if not pending[topic]:
+                            submit_section(topic)
+                    else:
+                        sections[str(key)] = future.result()
+        self.research_results = results
+        return sections
+
     def create_knowledge_document_with_research(
         self,
         search_model: Type[T],
         search_prompt: Prompt,
         search_limit: int,
         gen_prompt: Prompt,
+        cache_key: Optional[str] = None,
+        uncached_topics: Optional[List[str]] = None,
     ) -> str:
         """
         Create a knowledge document using an LLM based on the provided prompt with web search and prepare for RAG.
+        When a cache_key is given, the sections of the topics found in the knowledge cache are
+        attached to the collection with their embedded chunks instead of being researched again.
+        The entries are keyed by the embedding model as well. The uncached_topics depend on
+        more than the cached entity, they are always researched and never stored.
         Args:
         search_model (BaseModel): Pydantic model defining the structure for search results
         search_prompt (Prompt): Prompt template for generating search queries
         gen_prompt (Prompt): Prompt template for generating content from search results
+        cache_key (str, optional): Key of the researched entity in the knowledge cache
+        uncached_topics (List[str], optional): Topics of the search model that are not cached
 
         Returns:
             str: The generated knowledge document
@@ -263,54 +634,79 @@ class KnowledgeBaseBuilder:
             prompt=str(search_prompt),
             format=search_model,
         )
-
-        result_list = [
-            {
-                "topic": topic[0],
-                "queries": topic[1].queries,
-                "results": self.summarize_search_results(
-                    self.search.run(query=topic[1].queries, limit=search_limit)
-                ),
+        topics = [(topic, search.queries) for topic, search in search_queries]
+
+        uncached = set(uncached_topics or [])
+        knowledge: Dict[str, Dict] = {}
+        if cache_key:
+            cache_key = f"{cache_key}:{self.vectordb.embedding_model.model}"
+            knowledge = {
+                topic: section
+                for topic, section in (
+                    self.knowledge_cache.get(cache_key) or {}
+                ).items()
+                if topic not in uncached
             }
-            for topic in search_queries
-        ]
-
-        self.knowledge_document = ""
-
-        def generate_article_section(topic, search_results):
-            document_curation = f"#{topic}\n\n"
-
-            for item in search_results:
-                search_results_formatted = f"""<Query>\n{item["query"]}\n</Query>\n<Result>\n{item["summary"]}\n</Result>"""
-                document_curation = self.llm(
-                    str(gen_prompt)
-                    + str(
-                        Prompt(
-                            prompt="\n",
-                            section=topic,
-                            outline=document_curation,
-                            search_results=search_results_formatted,
-                        )
-                    )
+            if knowledge:
+                logger.info(
+                    f"Attached {len(knowledge)} cached knowledge sections of {cache_key}"
                 )
-            return document_curation
-
-        with ThreadPoolExecutor(len(search_model.model_fields)) as executor:
-            future_topics = {
-                executor.submit(
-                    generate_article_section, result["topic"], result["results"]
-                ): result["topic"]
-                for result in result_list
-            }
-
-            article_dict = {}
-            for future in as_completed(future_topics):
-                topic = future_topics[future]
-                section = future.result()
-                article_dict[topic] = section
 
-        for result in result_list:
-            self.knowledge_document += article_dict[result["topic"]]
+        pending = [(topic, query) for topic, query in topics if topic not in knowledge]
+        researched = {topic for topic, _ in pending}
+        self.research_results = {}
+        if pending:
+            self.section_usage = {"calls": 0, "tokens": 0}
+            start = time.perf_counter()
+            sections = self.research(pending, search_limit, gen_prompt)
+            logger.info(
+                f"Researched {len(pending)} topics in {time.perf_counter() - start:.1f}s, "
+                f"{research_config['section_mode']} sections used {self.section_usage['calls']} "
+                f"calls and {self.section_usage['tokens']} tokens"
+            )
+            for topic, _ in pending:
+                knowledge[topic] = {
+                    "document": sections[topic],
+                    "research": self.research_results[topic],
+                    "chunks": self.split_and_upload_document(sections[topic]),
+                }
 
-        self.split_and_upload_document(self.knowledge_document)
+        for topic, _ in topics:
+            if topic not in researched:
+                self.attach_knowledge(knowledge[topic])
+        self.research_results = {
+            topic: knowledge[topic]["research"] for topic, _ in topics
+        }
+        self.knowledge_document = "".join(
+            knowledge[topic]["document"] for topic, _ in topics
+        )
+        self.knowledge_chunks = {
+            key: [
+                item for topic, _ in topics for item in knowledge[topic]["chunks"][key]
+            ]
+            for key in ("docs", "embeddings")
+        }
+        if cache_key and researched - uncached:
+            self.knowledge_cache.set(
+                cache_key,
+                {
+                    topic: section
+                    for topic, section in knowledge.items()
+                    if topic not in uncached
+                },
+            )
         return self.knowledge_document
+
+    def attach_knowledge(self, cached: Dict):
+        """
+        Upserts the precomputed chunk embeddings of a cached knowledge section.
+        Args:
+            cached (Dict): Knowledge cache entry of a topic with its section "document", its
+                "research" summaries and the embedded "chunks"
+        """
+
+        self.vectordb.upsert_documents(
+            self.collection_name,
+            cached["chunks"]["docs"],
+            embeddings=cached["chunks"]["embeddings"],
+        )
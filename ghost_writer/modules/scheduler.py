@@ -0,0 +1,128 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from threading import BoundedSemaphore, Lock
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import yaml
+
+scheduler_config = yaml.safe_load(open("config/ghost_writer.yaml", "r"))[
+    "knowledge_builder"
+]["search"]["scheduler"]
+
+
+def get_host(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+class HostLimit:
+    """
+    Rate and concurrency limit of a single host.
+    Args:
+        interval (float): Minimum number of seconds between the starts of two requests
+        concurrency (int): Maximum number of requests in flight
+    """
+
+    def __init__(self, interval: float, concurrency: int):
+        self.interval = interval
+        self.semaphore = BoundedSemaphore(concurrency)
+        self.next_start = 0.0
+
+    def reserve(self, lock: Lock) -> float:
+        """
+        Reserves the next start time of the host and returns the seconds to wait for it.
+        """
+        with lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        return start - now
+
+
+class HostScheduler:
+    """
+    Politeness scheduler shared by the outbound search and crawl requests of every session.
+    Each host has its own minimum interval between request starts and cap on requests in
+    flight, requests to different hosts never wait on each other.
+    Slots are available to threads as a context manager and to coroutines as an async context
+    manager so the blocking searches and the crawler loop share the same limits.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.limits: Dict[str, HostLimit] = {}
+        self.waited = 0.0
+        self.requests = 0
+
+    def configure(self, host: str, interval: float, concurrency: int):
+        """
+        Sets the limit of a host unless it is already in use.
+        """
+        with self.lock:
+            self.limits.setdefault(host, HostLimit(interval, concurrency))
+
+    def get_limit(self, host: str) -> HostLimit:
+        with self.lock:
+            if host not in self.limits:
+                limit = scheduler_config["hosts"].get(host, scheduler_config["default"])
+                self.limits[host] = HostLimit(limit["interval"], limit["concurrency"])
+            return self.limits[host]
+
+    def record(self, waited: float):
+        with self.lock:
+            self.requests += 1
+            self.waited += waited
+
+    @contextmanager
+    def slot(self, host: str):
+        """
+        Blocks until a request to the host may start and holds a slot while it runs.
+        """
+        limit = self.get_limit(host)
+        start = time.perf_counter()
+        limit.semaphore.acquire()
+        try:
+            time.sleep(limit.reserve(self.lock))
+            self.record(time.perf_counter() - start)
+            yield
+        finally:
+            limit.semaphore.release()
+
+    @asynccontextmanager
+    async def async_slot(self, host: str):
+        """
+        Waits without blocking the event loop until a request to the host may start.
+        """
+        limit = self.get_limit(host)
+        start = time.perf_counter()
+        while not limit.semaphore.acquire(blocking=False):
+            await asyncio.sleep(0.05)
+        try:
+            await asyncio.sleep(limit.reserve(self.lock))
+            self.record(time.perf_counter() - start)
+            yield
+        finally:
+            limit.semaphore.release()
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "avg_wait": self.waited / self.requests if self.requests else 0.0,
+            }
+
+
+_host_scheduler: Optional[HostScheduler] = None
+_host_scheduler_lock = Lock()
+
+
+def get_host_scheduler() -> HostScheduler:
+    """
+    Returns the process wide host scheduler, created on first use.
+    """
+    global _host_scheduler
+    with _host_scheduler_lock:
+        if _host_scheduler is None:
+            _host_scheduler = HostScheduler()
+        return _host_scheduler
@@ -1,60 +1,234 @@
 import asyncio
+import json
+import math
 import os
-import random
 import time
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from threading import Lock, Thread
+from types import MappingProxyType
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
 from urllib.parse import urlparse
 
-import requests
+import httpx
 import yaml
-from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, CrawlResult
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from crawl4ai import CrawlerRunConfig
 from langchain_community.tools import DuckDuckGoSearchResults
-from trafilatura import extract
 
-from ghost_writer.modules.vectordb import Qdrant
+from ghost_writer.modules.corpus import WebCorpus, corpus_config, get_web_corpus
+from ghost_writer.modules.crawler import get_crawler_pool
+from ghost_writer.modules.fetcher import fetch_config, get_web_fetcher
+from ghost_writer.modules.scheduler import (
+    get_host,
+    get_host_scheduler,
+    scheduler_config,
+)
+from ghost_writer.modules.vectordb import get_vectordb, session_collection
+from ghost_writer.utils.cache import DiskCache, QueryCache
+from ghost_writer.utils.logger import logger
+from ghost_writer.utils.simhash import NearDuplicateDetector
+from ghost_writer.utils.text_splitter import RecursiveTextSplitter
+from ghost_writer.utils.urls import (
+    BloomFilter,
+    URLDedup,
+    canonicalize_url,
+    resolve_redirect,
+)
 from llms.basellm import LLM
 
 provider_config = yaml.safe_load(open("config/llms.yaml", "r"))
+config = yaml.safe_load(open("config/ghost_writer.yaml", "r"))
+client_config = config["knowledge_builder"]["search"]["client"]
+cache_config = config["cache"]
+dedup_config = config["knowledge_builder"]["search"]["dedup"]
+near_duplicate_config = dedup_config["near_duplicates"]
+pipeline_config = config["knowledge_builder"]["search"]["pipeline"]
+hyde_config = config["knowledge_builder"]["search"]["hyde"]
+
+_search_client: Optional[httpx.Client] = None
+_search_client_lock = Lock()
+
+
+def get_search_client() -> httpx.Client:
+    """
+    Returns the process wide keep-alive client of the search engine APIs, created on first use.
+    """
+    global _search_client
+    with _search_client_lock:
+        if _search_client is None:
+            _search_client = httpx.Client(
+                timeout=client_config["timeout"],
+                limits=httpx.Limits(max_connections=client_config["max_connections"]),
+            )
+        return _search_client
+
+
+T = TypeVar("T")
+
+
+class AsyncSearchClient:
+    """
+    Long-lived async client of the search engine APIs shared by the web searches of every session.
+    The httpx.AsyncClient is bound to a dedicated event loop thread, so every batch of queries
+    reuses its pooled keep-alive connections. Synchronous callers run coroutines on the loop
+    from any thread and wait on the result.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, name="search", daemon=True)
+        self.thread.start()
+        self.client = httpx.AsyncClient(
+            timeout=client_config["timeout"],
+            limits=httpx.Limits(max_connections=client_config["max_connections"]),
+        )
+
+    def run(self, coroutine: Callable[[httpx.AsyncClient], Awaitable[T]]) -> T:
+        """
+        Runs the coroutine function with the shared client on the client loop.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            coroutine(self.client), self.loop
+        ).result()
+
+    def close(self):
+        """
+        Closes the pooled connections and stops the client loop.
+        """
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+_async_search_client: Optional[AsyncSearchClient] = None
+
+
+def get_async_search_client() -> AsyncSearchClient:
+    """
+    Returns the process wide async client of the search engine APIs, created on first use.
+    """
+    global _async_search_client
+    with _search_client_lock:
+        if _async_search_client is None:
+            _async_search_client = AsyncSearchClient()
+        return _async_search_client
+
+
+def close_search_clients():
+    global _search_client, _async_search_client
+    with _search_client_lock:
+        if _search_client is not None:
+            _search_client.close()
+            _search_client = None
+        if _async_search_client is not None:
+            _async_search_client.close()
+            _async_search_client = None
+
+
+_url_bloom: Optional[BloomFilter] = None
+
+
+def get_url_bloom() -> BloomFilter:
+    """
+    Returns the Bloom filter of the urls fetched by every session, loaded on first use.
+    """
+    global _url_bloom
+    with _search_client_lock:
+        if _url_bloom is None:
+            _url_bloom = BloomFilter(
+                dedup_config["bloom"]["path"],
+                capacity=dedup_config["bloom"]["capacity"],
+                error_rate=dedup_config["bloom"]["error_rate"],
+            )
+        return _url_bloom
 
 
 class BaseWebSearch:
-    def __init__(self, webpage_chunk_size: int, webpage_chunk_overlap: int):
+    def __init__(
+        self,
+        webpage_chunk_size: int,
+        webpage_chunk_overlap: int,
+        session_id: Optional[str] = None,
+    ):
         """
         Initialize the search module.
+        Pages are indexed into the persistent web corpus shared by every session when it is
+        enabled, otherwise into a web search collection scoped to the session when a session_id
+        is given.
         """
         self.chunk_size = webpage_chunk_size
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.text_splitter = RecursiveTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=webpage_chunk_overlap,
-            length_function=len,
-            is_separator_regex=False,
-            separators=[
-                "\n\n",
-                "\n",
-                ".",
-                "\uff0e",
-                "\u3002",
-                ",",
-                "\uff0c",
-                "\u3001",
-                " ",
-                "\u200b",
-                "",
-            ],
         )
-        self.collection_name = "WebSearch"
+        self.fetcher = get_web_fetcher()
+        self.scheduler = get_host_scheduler()
+        self.crawler_pool = get_crawler_pool()
+        self.browser_starts = self.crawler_pool.stats()["browser_starts"]
+        self.crawls = 0
+        self.crawl_time = 0.0
+        self.stats_lock = Lock()
+        self.search_cache = DiskCache(
+            cache_config["path"],
+            "search_results",
+            ttl=cache_config["search"]["ttl"],
+            max_entries=cache_config["search"]["max_entries"],
+        )
+        self.page_cache = DiskCache(
+            cache_config["path"],
+            "pages",
+            ttl=cache_config["pages"]["ttl"],
+            max_entries=cache_config["pages"]["max_entries"],
+        )
+        self.hyde_cache = DiskCache(
+            cache_config["path"],
+            "hyde",
+            ttl=cache_config["hyde"]["ttl"],
+            max_entries=cache_config["hyde"]["max_entries"],
+        )
 
-        self.vectordb = Qdrant()
-        self.vectordb.create_collection(self.collection_name)
+        self.vectordb = get_vectordb()
+        self.corpus: Optional[WebCorpus] = None
+        if corpus_config["enabled"]:
+            self.corpus = get_web_corpus(self.chunk_size)
+            self.collection_name = self.corpus.collection_name
+        else:
+            self.collection_name = session_collection("WebSearch", session_id)
+            self.vectordb.create_collection(self.collection_name)
 
         self.llm = LLM(
             provider=provider_config["llm"]["provider"],
             model=provider_config["llm"]["model"],
         )
 
-        self.scraped_urls: List[str] = []
+        self.scraped_urls = URLDedup(
+            get_url_bloom() if dedup_config["bloom"]["enabled"] else None
+        )
         self.excluded_urls = ["linkedin.com"]
+        self.page_duplicates = NearDuplicateDetector(
+            near_duplicate_config["max_distance"]
+        )
+        self.chunk_duplicates = NearDuplicateDetector(
+            near_duplicate_config["max_distance"]
+        )
+        self.mirrors: Dict[str, Set[str]] = {}
+        self.duplicates = {
+            "pages": 0,
+            "chunks": 0,
+            "chars": 0,
+            "embedding_calls": 0,
+        }
 
     def get_domain(self, url: str):
         """
@@ -68,33 +242,22 @@ class BaseWebSearch:
         parsed_url = urlparse(url)
         return parsed_url.netloc
 
-    def clean_html(self, content: CrawlResult) -> Optional[str]:
-        """
-        Cleans HTML content by extracting plain text.
-        Args:
-            content: The HTML content to be cleaned. Expected to be a BeautifulSoup object with html attribute.
-
-        Returns:
-            str: The extracted plain text content with tables and comments removed.
-        """
-
-        return extract(
-            content.html,
-            include_tables=False,
-            include_comments=False,
-            output_format="txt",
-        )
-
     def get_web_content(
-        self, web_results: List[Dict[str, str]]
+        self,
+        web_results: List[Dict[str, str]],
+        on_page: Optional[Callable[[Dict[str, str]], Any]] = None,
     ) -> List[Dict[str, str]]:
         """
         Extracts and processes web content from a list of URLs using asynchronous web crawling.
+        Pages are fetched over HTTP first and only escalated to the shared browser crawler
+        when their text is too short or they are client side rendered shells, see WebFetcher.
         This method crawls multiple web pages simultaneously, extracts their content based on
         specified CSS selectors and filters, and returns the cleaned results.
         Args:
             web_results (List[dict]): A list of dictionaries containing web search results.
                 Each dictionary should have 'url' and optionally 'title' keys.
+            on_page (Optional[Callable]): Called with the processed content of each page that
+                could be extracted as soon as it is available, see WebFetcher.fetch.
 
         Returns:
             List[dict]: A list of dictionaries containing processed web content.
@@ -105,40 +268,203 @@ class BaseWebSearch:
         """
 
         urls: List[str] = [item["url"] for item in web_results]
-        self.scraped_urls.extend(urls)
-
-        async def _crawl():
-            async with AsyncWebCrawler(headless=True, sleep_on_close=True) as crawler:
-                config = CrawlerRunConfig(
-                    excluded_tags=[
-                        "form",
-                        "header",
-                        "footer",
-                        "nav",
-                    ],
-                    exclude_external_links=True,
-                    exclude_social_media_links=True,
-                    exclude_external_images=True,
-                )
 
-                results: List[CrawlResult] = await crawler.arun_many(  # type: ignore
-                    urls=urls,
-                    config=config,
-                    css_selector="main.content",
-                    word_count_threshold=50,
-                )
+        config = CrawlerRunConfig(
+            excluded_tags=[
+                "form",
+                "header",
+                "footer",
+                "nav",
+            ],
+            exclude_external_links=True,
+            exclude_social_media_links=True,
+            exclude_external_images=True,
+        )
+
+        def page_content(web_result: Dict[str, str], text: str) -> Dict[str, str]:
+            return {
+                "title": web_result.get("title", ""),
+                "url": web_result.get("url", ""),
+                "content": text,
+            }
+
+        start = time.perf_counter()
+        texts = self.fetcher.fetch(
+            urls,
+            config,
+            cache=self.page_cache,
+            on_page=None
+            if on_page is None
+            else lambda idx, text: on_page(page_content(web_results[idx], text)),
+            css_selector="main.content",
+            word_count_threshold=fetch_config["word_count_threshold"],
+        )
+        elapsed = time.perf_counter() - start
+        with self.stats_lock:
+            self.crawls += 1
+            self.crawl_time += elapsed
+        logger.info(f"Fetched {len(urls)} urls in {elapsed:.1f}s")
+        self.scraped_urls.extend(
+            url for url, text in zip(urls, texts) if text != "No Results"
+        )
+        self.scraped_urls.save()
 
-                return [
-                    {
-                        "title": web_result.get("title", ""),
-                        "url": web_result.get("url", ""),
-                        "content": self.clean_html(result) or "No Results",
-                    }
-                    for web_result, result in zip(web_results, results)
-                    if result
+        return [
+            page_content(web_result, text)
+            for web_result, text in zip(web_results, texts)
+        ]
+
+    def index_web_content(self, web_results: List[Dict[str, str]]) -> int:
+        """
+        Streams the pages of the web results into the vector database.
+        Pages already fetched by this session are skipped, pages that another session may have
+        fetched according to the url Bloom filter are skipped when the corpus holds them fresh.
+        Each page is chunked as soon as it is fetched and the chunks are embedded and upserted in
+        batches while the remaining pages are still fetched. The stages are connected by
+        bounded queues, a full queue blocks the stage feeding it.
+        Args:
+            web_results (List[dict]): Web search results with 'url' and optionally 'title' keys
+
+        Returns:
+            int: Number of chunks upserted
+        """
+        unique: Dict[str, Dict[str, str]] = {}
+        for web_result in web_results:
+            if web_result["url"] not in self.scraped_urls:
+                unique.setdefault(canonicalize_url(web_result["url"]), web_result)
+        web_results = list(unique.values())
+        if self.corpus is not None:
+            fresh, stale = self.corpus.split_fresh(
+                [
+                    web_result["url"]
+                    for web_result in web_results
+                    if self.scraped_urls.maybe_fetched(web_result["url"])
                 ]
+            )
+            if stale:
+                self.vectordb.delete_documents(self.collection_name, stale)
+            web_results = [
+                web_result
+                for web_result in web_results
+                if web_result["url"] not in fresh
+            ]
+        if not web_results:
+            return 0
+        indexed: Set[str] = set()
+        pages: Queue = Queue(maxsize=pipeline_config["queue_size"])
+        batches: Queue = Queue(maxsize=pipeline_config["queue_size"])
+        batch_size = pipeline_config["batch_size"]
+
+        def drain(queue: Queue):
+            while queue.get() is not None:
+                pass
+
+        def chunk_pages():
+            batch: List[Dict[str, str]] = []
+            try:
+                while (page := pages.get()) is not None:
+                    batch.extend(self.split_documents([page]))
+                    while len(batch) >= batch_size:
+                        batches.put(batch[:batch_size])
+                        batch = batch[batch_size:]
+                if batch:
+                    batches.put(batch)
+            except Exception:
+                drain(pages)
+                raise
+            finally:
+                batches.put(None)
+
+        def upsert_batches() -> int:
+            upserted = 0
+            try:
+                while (batch := batches.get()) is not None:
+                    self.vectordb.upsert_documents(self.collection_name, batch)
+                    indexed.update(doc["url"] for doc in batch)
+                    upserted += len(batch)
+            except Exception:
+                drain(batches)
+                raise
+            return upserted
+
+        with ThreadPoolExecutor(2) as executor:
+            chunker = executor.submit(chunk_pages)
+            upserter = executor.submit(upsert_batches)
+            try:
+                self.get_web_content(web_results, on_page=pages.put)
+            finally:
+                pages.put(None)
+            chunker.result()
+            upserted = upserter.result()
+        if self.corpus is not None:
+            self.corpus.add(indexed)
+        return upserted
+
+    def query_collection(
+        self, hy_document: str, web_results: List[Dict[str, str]]
+    ) -> List[Dict[str, str]]:
+        """
+        Queries the pages of the web results with the query document, see format_payloads.
+        The corpus is shared by every session, so only the chunks of the pages of these web
+        results fetched within the corpus max_age are returned and their retrievals are
+        counted for compaction. Pages dropped as near-duplicates are queried through the pages
+        they mirror.
+        Args:
+            hy_document (str): Query document
+            web_results (List[dict]): Web search results of this run with 'url' keys
+        """
+        urls = [web_result["url"] for web_result in web_results]
+        if not urls:
+            return self.format_payloads([])
+        pending = list(urls)
+        with self.stats_lock:
+            while pending:
+                for mirror in self.mirrors.get(pending.pop(), ()):
+                    if mirror not in urls:
+                        urls.append(mirror)
+                        pending.append(mirror)
+        if self.corpus is not None:
+            urls = list(set(urls) | set(self.corpus.page_urls(urls)))
+        result = self.vectordb.query_documents(
+            self.collection_name,
+            hy_document,
+            max_age=corpus_config["max_age"] if self.corpus is not None else None,
+            urls=urls,
+        )
+        if self.corpus is not None and result:
+            self.corpus.record_hits({point.payload["doc"]["url"] for point in result})
+        return self.format_payloads(result)
+
+    def crawl_stats(self) -> Dict:
+        """
+        Crawls and average crawl latency of this search, browser starts since it was created,
+        the hit rates and latencies of the fetch tiers, the page outcomes and per host timings of
+        the shared crawler and the hit rates of the caches of this search.
+        """
+        return {
+            "crawls": self.crawls,
+            "avg_crawl_time": self.crawl_time / self.crawls if self.crawls else 0.0,
+            "browser_starts": self.crawler_pool.stats()["browser_starts"]
+            - self.browser_starts,
+            "tiers": self.fetcher.stats(),
+            "crawler": self.crawler_pool.stats(),
+            "hosts": self.crawler_pool.page_stats(),
+            "search_cache": self.search_cache.stats(),
+            "page_cache": self.page_cache.stats(),
+            "hyde_cache": self.hyde_cache.stats(),
+            "corpus": self.corpus.stats() if self.corpus is not None else None,
+            "duplicates": self.duplicate_stats(),
+        }
 
-        return asyncio.run(_crawl())
+    def duplicate_stats(self) -> Dict[str, int]:
+        """
+        Near-duplicate pages and chunks dropped before embedding, with the embedding calls and
+        the bytes of vectors and text they would have cost.
+        """
+        with self.stats_lock:
+            return self.duplicates | {
+                "bytes": self.duplicates["chunks"] * 768 * 4 + self.duplicates["chars"]
+            }
 
     def split_documents(
         self, content_list: List[Dict[str, str]]
@@ -155,23 +481,69 @@ class BaseWebSearch:
                   - title (str): The original document's title
                   - url (str): The original document's URL
                   - text (str): A chunk of the original document's content
-
+                  Near-duplicates of pages and chunks already seen by this search are dropped,
+                  the url of a dropped page is mapped to the urls of the pages it mirrors.
         """
 
         doc_list: List[Dict[str, str]] = []
+        mirrors: List[Tuple[str, str]] = []
+        dropped_pages = dropped_chunks = dropped_chars = total_chunks = 0
         for content in content_list:
             text_content = content.get("content", None)
+            url = content.get("url", "")
             if isinstance(text_content, str):
-                chunks = self.text_splitter.split_text(text_content)
-                chunk_list = [
-                    {
-                        "title": content.get("title", ""),
-                        "url": content.get("url", ""),
-                        "text": chunk,
-                    }
-                    for chunk in chunks
-                ]
-                doc_list.extend(chunk_list)
+                mirror = (
+                    self.page_duplicates.match(text_content, url)
+                    if near_duplicate_config["enabled"]
+                    else None
+                )
+                if mirror is not None:
+                    mirrors.append((url, mirror))
+                    page_chunks = sum(
+                        1 for _ in self.text_splitter.iter_chunks(text_content)
+                    )
+                    dropped_pages += 1
+                    dropped_chunks += page_chunks
+                    total_chunks += page_chunks
+                    dropped_chars += len(text_content)
+                    continue
+                for chunk in self.text_splitter.iter_chunks(text_content):
+                    total_chunks += 1
+                    mirror = (
+                        self.chunk_duplicates.match(chunk, url)
+                        if near_duplicate_config["enabled"]
+                        else None
+                    )
+                    if mirror is not None:
+                        mirrors.append((url, mirror))
+                        dropped_chunks += 1
+                        dropped_chars += len(chunk)
+                        continue
+                    doc_list.append(
+                        {
+                            "title": content.get("title", ""),
+                            "url": url,
+                            "text": chunk,
+                        }
+                    )
+
+        with self.stats_lock:
+            for url, mirror in mirrors:
+                if url != mirror:
+                    self.mirrors.setdefault(url, set()).add(mirror)
+        if dropped_pages or dropped_chunks:
+            embedding_calls = math.ceil(total_chunks / 100) - math.ceil(
+                len(doc_list) / 100
+            )
+            with self.stats_lock:
+                self.duplicates["pages"] += dropped_pages
+                self.duplicates["chunks"] += dropped_chunks
+                self.duplicates["chars"] += dropped_chars
+                self.duplicates["embedding_calls"] += embedding_calls
+            logger.info(
+                f"Dropped {dropped_pages} near-duplicate pages, {dropped_chunks} chunks "
+                f"({dropped_chars} chars), {embedding_calls} embedding calls saved"
+            )
         return doc_list
 
     def generate_fake_document(self, query: str) -> str:
@@ -193,6 +565,22 @@ class BaseWebSearch:
 
         return hy_document
 
+    def query_document(self, query: str) -> str:
+        """
+        Returns the text embedded to query the web search collection for the query.
+        The HyDE document of the query is reused from the HyDE cache for the same query, model and
+        chunk size. The raw query is used instead when HyDE is disabled or the query has fewer
+        words than hyde.min_words.
+        """
+        if not hyde_config["enabled"] or len(query.split()) < hyde_config["min_words"]:
+            return query
+        key = f"{provider_config['llm']['model']}:{self.chunk_size}:{QueryCache.normalize(query)}"
+        hy_document = self.hyde_cache.get(key)
+        if hy_document is None:
+            hy_document = self.generate_fake_document(query)
+            self.hyde_cache.set(key, hy_document)
+        return hy_document
+
     def format_payloads(self, payloads):
         """
         Format a list of search result payloads into a simplified list of dict for vector database.
@@ -226,6 +614,7 @@ class BaseWebSearch:
     def run(self, query: str, limit: int = 5):
         """
         Executes a web search, retrieves content, and performs vector database operations.
+        The hypothetical document of the query is generated while the pages are indexed.
         Args:
             query (str): The search query string to be processed
 
@@ -236,67 +625,89 @@ class BaseWebSearch:
         results = self.get_urls(query, limit=limit)
         if not results:
             return [{"query": query, "result": self.format_payloads([])}]
-        content_list: List = self.get_web_content(results)
-        if not content_list:
-            return [{"query": query, "result": self.format_payloads([])}]
-        self.vectordb.upsert_documents(
-            self.collection_name, self.split_documents(content_list)
-        )
-        result = self.vectordb.query_documents(
-            self.collection_name, self.generate_fake_document(query)
-        )
-        return [{"query": query, "result": self.format_payloads(result)}]
+        with ThreadPoolExecutor(1) as executor:
+            hy_document = executor.submit(self.query_document, query)
+            self.index_web_content(results)
+            result = self.query_collection(hy_document.result(), results)
+        return [{"query": query, "result": result}]
 
     def run_many(self, queries: List[str], limit: int = 5):
         """
         Process multiple search queries, fetch web content, and store in vector database.
+        The queries are searched concurrently within the limits of the host scheduler and their
+        HyDE documents are generated concurrently from the start, see query_document.
         See run method.
         """
 
-        url_list = []
-        for query in queries:
-            result = self.get_urls(query, limit=limit)
-            if result:
-                url_list.extend(result)
-        if not url_list:
-            return [{"query": "", "result": self.format_payloads([])}]
-        content_list = self.get_web_content(url_list)
-        if not content_list:
-            return [{"query": "", "result": self.format_payloads([])}]
-        self.vectordb.upsert_documents(
-            self.collection_name, self.split_documents(content_list)
+        executor = ThreadPoolExecutor(
+            max(1, min(len(queries), hyde_config["concurrency"]))
         )
-        result_list = []
-        for query in queries:
-            result = self.vectordb.query_documents(
-                self.collection_name, self.generate_fake_document(query)
-            )
-            result_list.append({"query": query, "result": self.format_payloads(result)})
-        return result_list
+        hy_documents = [
+            executor.submit(self.query_document, query) for query in queries
+        ]
+        try:
+            url_list = []
+            for result in self.get_urls_many(queries, limit=limit):
+                if result:
+                    url_list.extend(result)
+            if not url_list:
+                return [{"query": "", "result": self.format_payloads([])}]
+            self.index_web_content(url_list)
+            return [
+                {
+                    "query": query,
+                    "result": self.query_collection(hy_document.result(), url_list),
+                }
+                for query, hy_document in zip(queries, hy_documents)
+            ]
+        finally:
+            executor.shutdown(cancel_futures=True)
 
-    def get_urls(self, query: str, limit: int = 3, **kwargs):
+    def search_engine(self, query: str, **kwargs) -> Optional[List[Dict[str, str]]]:
+        """
+        Returns the unfiltered title and url of every result of the query, None if the search failed.
+        """
         raise NotImplementedError
 
+    async def asearch_engine(
+        self, client: httpx.AsyncClient, query: str, **kwargs
+    ) -> Optional[List[Dict[str, str]]]:
+        """
+        Async variant of search_engine, runs the blocking search in a thread unless overridden.
+        """
+        return await asyncio.to_thread(self.search_engine, query, **kwargs)
+
+    def search_key(self, query: str, **kwargs) -> str:
+        return f"{type(self).__name__}:{QueryCache.normalize(query)}:{json.dumps(kwargs, sort_keys=True)}"
 
-class SearXNGWeb(BaseWebSearch):
-    def __init__(self, webpage_chunk_size, webpage_chunk_overlap):
+    def filter_results(
+        self, results: List[Dict[str, str]], limit: int
+    ) -> List[Dict[str, str]]:
         """
-        Initialize the search module.
+        Resolves known redirects and keeps at most limit distinct results that are not on
+        excluded domains. Urls fetched before are kept so their pages can be retrieved, they
+        are not fetched again, see index_web_content.
         """
-        super().__init__(webpage_chunk_size, webpage_chunk_overlap)
-        self.instance = os.getenv("SEARXNG_HOST")
-        self.params = {
-            "format": "json",
-            "categories": "general",
-            "language": "en",
-        }
+        filtered = []
+        seen = set()
+        for result in results:
+            if len(filtered) == limit:
+                break
+            url = resolve_redirect(result["url"])
+            if self.get_domain(url).removeprefix("www.") in self.excluded_urls:
+                continue
+            if canonicalize_url(url) not in seen:
+                seen.add(canonicalize_url(url))
+                filtered.append(result | {"url": url})
+        return filtered
 
     def get_urls(self, query: str, limit: int = 3, **kwargs):
         """
-        Fetch search results from a specified search engine instance based on the given query.
+        Fetch search results from the search engine based on the given query.
+        Results of a query searched on the same engine within the search cache ttl are reused.
         Args:
             query (str): The search query string to be executed
-            limit (int, optional): Maximum number of results to return. Defaults to 5.
+            limit (int, optional): Maximum number of results to return. Defaults to 3.
             **kwargs: Additional parameters to be passed to the search request
 
         Returns:
@@ -306,118 +717,170 @@ class SearXNGWeb(BaseWebSearch):
                 Results are filtered to exclude previously scraped URLs and excluded domains.
                 Maximum length is determined by limit parameter.
         """
-        self.params |= {"q": query, **kwargs}
+        key = self.search_key(query, **kwargs)
+        results = self.search_cache.get(key)
+        if results is None:
+            results = self.search_engine(query, **kwargs)
+            if results is None:
+                return None
+            self.search_cache.set(key, results)
+        return self.filter_results(results, limit)
+
+    async def aget_urls(
+        self, client: httpx.AsyncClient, query: str, limit: int = 3, **kwargs
+    ):
+        """
+        Async variant of get_urls on the given client.
+        """
+        key = self.search_key(query, **kwargs)
+        results = self.search_cache.get(key)
+        if results is None:
+            results = await self.asearch_engine(client, query, **kwargs)
+            if results is None:
+                return None
+            self.search_cache.set(key, results)
+        return self.filter_results(results, limit)
+
+    def get_urls_many(self, queries: List[str], limit: int = 3, **kwargs):
+        """
+        Fetches the search results of a batch of queries concurrently on the shared async client,
+        its connections are kept alive across batches.
+        Returns:
+            list: The get_urls result of each query in order
+        """
+
+        async def _get_urls_many(client: httpx.AsyncClient):
+            return await asyncio.gather(
+                *(self.aget_urls(client, query, limit, **kwargs) for query in queries)
+            )
+
+        return get_async_search_client().run(_get_urls_many)
+
+
+class HTTPWebSearch(BaseWebSearch):
+    """
+    Web search over a JSON search API.
+    Requests go through the shared keep-alive search client, the async variant issues a batch of
+    queries concurrently on the shared async client. Subclasses build the request of a query
+    and parse the response.
+    """
+
+    def request(self, query: str, **kwargs) -> Tuple[str, Dict[str, str]]:
+        """
+        Returns the url and the params of the search request of the query.
+        """
+        raise NotImplementedError
+
+    def parse_results(self, data: Dict) -> List[Dict[str, str]]:
+        raise NotImplementedError
 
-        delay = random.uniform(5, 10)  # manual delay
-        time.sleep(delay)
+    def search_engine(self, query: str, **kwargs) -> Optional[List[Dict[str, str]]]:
+        url, params = self.request(query, **kwargs)
 
         try:
-            if self.instance:
-                response = requests.get(self.instance, params=self.params)
-            else:
-                raise EnvironmentError("Searxng host environment variable not set")
+            with self.scheduler.slot(get_host(url)):
+                response = get_search_client().get(url, params=params)
             response.raise_for_status()
 
-            data = response.json()
+            return self.parse_results(response.json())
 
-            return [
-                {"title": result.get("title", ""), "url": result.get("url", "")}
-                for result in data["results"]
-                if result["url"] not in self.scraped_urls
-                and self.get_domain(result["url"]) not in self.excluded_urls
-            ][:limit]
+        except httpx.HTTPError as e:
+            print(f"Request failed: {e}")
+        except KeyError as e:
+            print(f"Unexpected JSON format: {e}")
+
+    async def asearch_engine(
+        self, client: httpx.AsyncClient, query: str, **kwargs
+    ) -> Optional[List[Dict[str, str]]]:
+        url, params = self.request(query, **kwargs)
+
+        try:
+            async with self.scheduler.async_slot(get_host(url)):
+                response = await client.get(url, params=params)
+            response.raise_for_status()
 
-        except requests.exceptions.RequestException as e:
+            return self.parse_results(response.json())
+
+        except httpx.HTTPError as e:
             print(f"Request failed: {e}")
         except KeyError as e:
             print(f"Unexpected JSON format: {e}")
 
 
-class GoogleWeb(BaseWebSearch):
-    def __init__(self, webpage_chunk_size, webpage_chunk_overlap):
+class SearXNGWeb(HTTPWebSearch):
+    def __init__(self, webpage_chunk_size, webpage_chunk_overlap, session_id=None):
         """
-        Initialize the Google search module.
+        Initialize the search module.
         """
-        super().__init__(webpage_chunk_size, webpage_chunk_overlap)
-        self.instance = "https://www.googleapis.com/customsearch/v1?"
-        self.params = {
-            "key": os.getenv("GOOGLE_WEB_API_KEY"),
-            "cx": os.getenv("GOOGLE_WEB_CX"),
-        }
+        super().__init__(webpage_chunk_size, webpage_chunk_overlap, session_id)
+        self.instance = os.getenv("SEARXNG_HOST")
+        if self.instance:
+            self.scheduler.configure(
+                get_host(self.instance), **scheduler_config["searxng"]
+            )
+        self.params = MappingProxyType(
+            {
+                "format": "json",
+                "categories": "general",
+                "language": "en",
+            }
+        )
 
-    def get_urls(self, query: str, limit: int = 3, **kwargs):
-        """
-        Fetch search results from a specified search engine instance based on the given query.
-        Args:
-            query (str): The search query string to be executed
-            limit (int, optional): Maximum number of results to return. Defaults to 5.
-            **kwargs: Additional parameters to be passed to the search request
+    def request(self, query: str, **kwargs) -> Tuple[str, Dict[str, str]]:
+        if not self.instance:
+            raise EnvironmentError("Searxng host environment variable not set")
+        return self.instance, self.params | {"q": query, **kwargs}
 
-        Returns:
-            list: A list of dictionaries containing search results. Each dictionary contains:
-                - title (str): Title of the search result
-                - url (str): URL of the search result
-                Results are filtered to exclude previously scraped URLs and excluded domains.
-                Maximum length is determined by limit parameter.
-        """
-        self.params |= {"q": query, **kwargs}
+    def parse_results(self, data: Dict) -> List[Dict[str, str]]:
+        return [
+            {"title": result.get("title", ""), "url": result["url"]}
+            for result in data["results"]
+        ]
 
-        try:
-            response = requests.get(self.instance, params=self.params)
-            response.raise_for_status()
 
-            data = response.json()
+class GoogleWeb(HTTPWebSearch):
+    def __init__(self, webpage_chunk_size, webpage_chunk_overlap, session_id=None):
+        """
+        Initialize the Google search module.
+        """
+        super().__init__(webpage_chunk_size, webpage_chunk_overlap, session_id)
+        self.instance = "https://www.googleapis.com/customsearch/v1?"
+        self.params = MappingProxyType(
+            {
+                "key": os.getenv("GOOGLE_WEB_API_KEY"),
+                "cx": os.getenv("GOOGLE_WEB_CX"),
+            }
+        )
 
-            return [
-                {"title": result.get("title", ""), "url": result.get("link", "")}
-                for result in data["items"]
-                if result["link"] not in self.scraped_urls
-                and self.get_domain(result["link"]) not in self.excluded_urls
-            ][:limit]
+    def request(self, query: str, **kwargs) -> Tuple[str, Dict[str, str]]:
+        return self.instance, self.params | {"q": query, **kwargs}
 
-        except requests.exceptions.RequestException as e:
-            print(f"Request failed: {e}")
-        except KeyError as e:
-            print(f"Unexpected JSON format: {e}")
+    def parse_results(self, data: Dict) -> List[Dict[str, str]]:
+        return [
+            {"title": result.get("title", ""), "url": result["link"]}
+            for result in data["items"]
+        ]
 
 
 class DDGWeb(BaseWebSearch):
-    def __init__(self, webpage_chunk_size, webpage_chunk_overlap):
+    def __init__(self, webpage_chunk_size, webpage_chunk_overlap, session_id=None):
         """
         Initialize the DuckDuckGo search module.
         """
-        super().__init__(webpage_chunk_size, webpage_chunk_overlap)
+        super().__init__(webpage_chunk_size, webpage_chunk_overlap, session_id)
         self.client = DuckDuckGoSearchResults(
             output_format="list", keys_to_include=["title", "link"]
         )
 
-    def get_urls(self, query: str, limit=5, **kwargs):
-        """
-        Fetch search results from a specified search engine instance based on the given query.
-        Args:
-            query (str): The search query string to be executed
-            limit (int, optional): Maximum number of results to return. Defaults to 5.
-            **kwargs: Additional parameters to be passed to the search request
-
-        Returns:
-            list: A list of dictionaries containing search results. Each dictionary contains:
-                - title (str): Title of the search result
-                - url (str): URL of the search result
-                Results are filtered to exclude previously scraped URLs and excluded domains.
-                Maximum length is determined by limit parameter.
-        """
-        delay = random.uniform(3, 5)
-        time.sleep(delay)
-
+    def search_engine(self, query: str, **kwargs) -> Optional[List[Dict[str, str]]]:
         try:
-            data = self.client.invoke(query)
+            with self.scheduler.slot("duckduckgo.com"):
+                data = self.client.invoke(query)
 
             return [
-                {"title": result.get("title", ""), "url": result.get("link", "")}
+                {"title": result.get("title", ""), "url": result["link"]}
                 for result in data
-                if result["link"] not in self.scraped_urls
-                and self.get_domain(result["link"]) not in self.excluded_urls
-            ][:limit]
+            ]
 
         except Exception as e:
             print(f"Unexpected error fetching urls: {e}")
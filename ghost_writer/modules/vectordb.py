@@ -1,53 +1,464 @@
+import hashlib
+import json
 import os
-from typing import Dict, List, Union
+import re
+import shutil
+import time
+import uuid
+from threading import Lock
+from typing import Dict, List, Optional, Set, Tuple, Union
 
+import numpy as np
 import spacy
+import yaml
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import (
     Condition,
     Distance,
     FieldCondition,
     Filter,
+    FilterSelector,
+    Fusion,
+    FusionQuery,
+    MatchAny,
     MatchValue,
+    Modifier,
+    PayloadSchemaType,
     PointStruct,
+    Prefetch,
+    Range,
+    ScoredPoint,
+    SparseVector,
+    SparseVectorParams,
     VectorParams,
 )
 
-from llms.basellm import EmbeddingModel
+from ghost_writer.utils.bm25 import BM25
+from ghost_writer.utils.cache import QueryCache
+from llms.basellm import EmbeddingModel, get_tokenizer
 
+config = yaml.safe_load(open("config/ghost_writer.yaml", "r"))
+vectordb_config = config["knowledge_builder"]["vectordb"]
+query_config = config["knowledge_builder"]["qdrant"]["query"]
+cutoff_config = query_config["cutoff"]
+cache_config = query_config["cache"]
+
+SESSION_PATTERN = re.compile(
+    r"^.+-[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$"
+)
+
+
+def session_collection(collection_name: str, session_id: Optional[str]) -> str:
+    """
+    Scopes a collection name to a session so that concurrent sessions do not share collections.
+    Args:
+        collection_name (str): Base name of the collection
+        session_id (Optional[str]): uuid4 of the session, the base name is returned if None
+
+    Returns:
+        str: The session scoped collection name
+    """
+    if not session_id:
+        return collection_name
+    return f"{collection_name}-{session_id}"
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Union[int, str]]], k: int = 60
+) -> List[Tuple[Union[int, str], float]]:
+    """
+    Fuses several rankings of ids with reciprocal rank fusion.
+    Args:
+        rankings (List[List]): Lists of ids, each ordered from best to worst
+        k (int): Rank smoothing constant
+
+    Returns:
+        List[Tuple]: (id, fused score) pairs ordered by descending score
+    """
+    scores: Dict[Union[int, str], float] = {}
+    for ranking in rankings:
+        for rank, idx in enumerate(ranking):
+            scores[idx] = scores.get(idx, 0.0) + 1 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class VectorDB:
+    """
+    Base vector store with shared embedding, entity extraction and lexical encoding.
+    Backends implement the collection management, upsert and query methods.
+    Each collection holds a dense embedding and a sparse BM25 vector per document, when
+    hybrid search is enabled the two rankings are fused with reciprocal rank fusion.
+    The last access of every collection is tracked in process to garbage collect the
+    collections of stale sessions.
+    Query results are cached per collection and shared by every instance in the process,
+    the cache hit rate is tracked per instance.
+    """
+
+    _last_access: Dict[str, float] = {}
+    _started = time.time()
+    _query_cache = QueryCache(max_entries=cache_config["max_entries"])
 
-class Qdrant:
     def __init__(self):
-        self.client = QdrantClient(url=os.getenv("QDRANT_URL"))
         self.embedding_model = EmbeddingModel()
         self.nlp = spacy.load("en_core_web_sm")
+        self.bm25 = BM25(**vectordb_config["bm25"])
+        self.hybrid: bool = query_config["hybrid"]
+        self.prefetch_limit: int = query_config["prefetch_limit"]
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def create_collection(self, collection_name: str, recreate: bool = True):
+        raise NotImplementedError
+
+    def delete_collection(self, collection_name: str):
+        raise NotImplementedError
+
+    def delete_documents(self, collection_name: str, urls: List[str]):
+        raise NotImplementedError
+
+    def get_collections(self) -> List[str]:
+        raise NotImplementedError
 
-    def create_collection(self, collection_name: str):
+    def upsert_documents(
+        self,
+        collection_name: str,
+        doc_list: List[Dict[str, str]],
+        embeddings: Optional[List[List[float]]] = None,
+    ):
+        raise NotImplementedError
+
+    def search(
+        self,
+        collection_name: str,
+        query: str,
+        query_emb: List[float],
+        limit: int,
+        with_vectors: bool,
+        score_threshold: Optional[float],
+        min_fetched_at: Optional[float] = None,
+        urls: Optional[List[str]] = None,
+    ) -> List[ScoredPoint]:
+        raise NotImplementedError
+
+    def query_documents(
+        self,
+        collection_name: str,
+        query: str,
+        limit=5,
+        with_vectors=False,
+        score_threshold: Optional[float] = cutoff_config["score_threshold"],
+        score_gap: Optional[float] = cutoff_config["score_gap"],
+        token_budget: Optional[int] = cutoff_config["token_budget"],
+        max_age: Optional[float] = None,
+        urls: Optional[List[str]] = None,
+    ) -> List[ScoredPoint]:
         """
-        Creates a new collection in the vector database with specified parameters.
-        If a collection with the same name already exists, it will be deleted first.
+        Queries the vector database for similar documents based on semantic similarity and named entities.
+        With hybrid search the entity filtered dense results are fused with BM25 keyword matches.
+        Results are served from the query cache when the same normalized query, or in semantic
+        mode a query with a near identical embedding, was searched since the last upsert.
+        The score cutoffs apply to the cosine similarity of the results to the query, with hybrid
+        search to the fused results of both indexes, see dense_cutoff.
         Args:
-            collection_name (str): Name of the collection to be created
+            collection_name (str): Name of the collection to query in the vector database.
+            query (str): The search query text.
+            limit (int, optional): Maximum number of results to return. Defaults to 5.
+            with_vectors (bool, optional): Whether to return the dense vectors. Defaults to False.
+            score_threshold (float, optional): Minimum cosine similarity of the results.
+            score_gap (float, optional): Relative cosine similarity drop at which the results are cut.
+            token_budget (int, optional): Maximum number of tokens of the returned chunks.
+            max_age (float, optional): Only documents upserted within this many seconds are returned.
+            urls (List[str], optional): Only the chunks of the pages of these urls are returned.
+
+        Returns:
+            list: List of Point objects containing the matched documents and their metadata.
+                 Each Point contains payload with document information.
         """
-        if self.client.collection_exists(collection_name):
-            self.client.delete_collection(collection_name)
+        self.touch(collection_name)
+        params = (
+            limit,
+            with_vectors,
+            score_threshold,
+            score_gap,
+            token_budget,
+            max_age,
+            None if urls is None else tuple(sorted(set(urls))),
+        )
+        key = (QueryCache.normalize(query), *params)
+        version = self._query_cache.version(collection_name)
+        if cache_config["enabled"]:
+            cached = self._query_cache.get(collection_name, key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
 
-        self.client.create_collection(
-            collection_name=collection_name,
-            vectors_config=VectorParams(size=768, distance=Distance.COSINE),
+        query_emb = self.embedding_model(query)[0]
+        if cache_config["enabled"] and cache_config["semantic"]:
+            cached = self._query_cache.get_similar(
+                collection_name, params, query_emb, cache_config["similarity_threshold"]
+            )
+            if cached is not None:
+                self.cache_hits += 1
+                self._query_cache.put(
+                    collection_name, key, params, version, query_emb, cached
+                )
+                return cached
+
+        self.cache_misses += 1
+        cutoff = self.hybrid and (score_threshold is not None or score_gap is not None)
+        points = self.search(
+            collection_name,
+            query,
+            query_emb,
+            max(limit, self.prefetch_limit) if cutoff else limit,
+            with_vectors or cutoff,
+            score_threshold,
+            None if max_age is None else time.time() - max_age,
+            urls,
+        )
+        if cutoff:
+            points = self.dense_cutoff(points, query_emb, score_threshold, score_gap)
+            points = points[:limit]
+            if not with_vectors:
+                for point in points:
+                    point.vector = None
+        points = self.truncate_results(
+            points, None if cutoff else score_gap, token_budget
         )
+        if cache_config["enabled"]:
+            self._query_cache.put(
+                collection_name, key, params, version, query_emb, points
+            )
+        return points
 
-    def get_collections(self):
+    def cache_stats(self) -> Dict[str, float]:
         """
-        Generate a list of collections in the vectordb
+        Query cache statistics of this instance.
         Returns:
-            List: A list of collections names
+            Dict[str, float]: hits, misses and hit_rate
+        """
+        total = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": self.cache_hits / total if total else 0.0,
+        }
+
+    def dense_cutoff(
+        self,
+        points: List[ScoredPoint],
+        query_emb: List[float],
+        score_threshold: Optional[float] = None,
+        score_gap: Optional[float] = None,
+    ) -> List[ScoredPoint]:
         """
+        Applies the score cutoffs to fused hybrid results.
+        Fused scores are reciprocal ranks, so the cosine similarity of each point to the query is
+        computed from its dense vector. The score_threshold and the first score_gap drop of the
+        similarities in descending order set a minimum similarity, points below it are dropped
+        whichever index retrieved them.
+        Args:
+            points (List[ScoredPoint]): Fused results with their dense vectors.
+            query_emb (List[float]): Embedding of the query.
+            score_threshold (Optional[float]): Minimum cosine similarity.
+            score_gap (Optional[float]): Relative cosine similarity drop at which the results are cut.
 
+        Returns:
+            List[ScoredPoint]: The points above the minimum similarity in their fused order.
+        """
+        if not points:
+            return points
+        query = np.asarray(query_emb, dtype=np.float32)
+        query /= np.linalg.norm(query) + 1e-12
+        similarities = np.asarray([self.unit_vector(point) @ query for point in points])
+        floor = -np.inf if score_threshold is None else score_threshold
+        ranked = np.sort(similarities[similarities >= floor])[::-1]
+        if score_gap is not None and len(ranked):
+            top = abs(ranked[0]) + 1e-12
+            for i in range(1, len(ranked)):
+                if (ranked[i - 1] - ranked[i]) / top > score_gap:
+                    floor = ranked[i - 1]
+                    break
         return [
-            collection.name for collection in self.client.get_collections().collections
+            point
+            for point, similarity in zip(points, similarities)
+            if similarity >= floor
         ]
 
+    def truncate_results(
+        self,
+        points: List[ScoredPoint],
+        score_gap: Optional[float] = None,
+        token_budget: Optional[int] = None,
+    ) -> List[ScoredPoint]:
+        """
+        Adapts the retrieval depth to the scores and size of the results.
+        Args:
+            points (List[ScoredPoint]): Results ordered by descending score.
+            score_gap (Optional[float]): Cuts the results at the first drop between consecutive
+                scores larger than this fraction of the top score.
+            token_budget (Optional[int]): Keeps as many top results as fit in this number of tokens,
+                the top result is always kept.
+
+        Returns:
+            List[ScoredPoint]: The truncated results.
+        """
+        if score_gap is not None and points:
+            top = abs(points[0].score) + 1e-12
+            for i in range(1, len(points)):
+                if (points[i - 1].score - points[i].score) / top > score_gap:
+                    points = points[:i]
+                    break
+
+        if token_budget is not None:
+            tokenizer = get_tokenizer()
+            kept: List[ScoredPoint] = []
+            used = 0
+            for point in points:
+                text = point.payload["doc"]["text"] if point.payload else ""
+                tokens = len(tokenizer.encode(text))
+                if kept and used + tokens > token_budget:
+                    break
+                kept.append(point)
+                used += tokens
+            points = kept
+        return points
+
+    def query_many(
+        self, collection_name: str, queries: List[str], limit=5
+    ) -> List[List[ScoredPoint]]:
+        """
+        Queries the vector database with all queries of one turn and post-processes the results.
+        Chunks already returned for an earlier query are dropped by point id or content hash and,
+        when enabled, maximal marginal relevance selects each query's results from a larger
+        candidate set, penalizing similarity to every chunk selected so far in the turn.
+        Args:
+            collection_name (str): Name of the collection to query in the vector database.
+            queries (List[str]): The search queries of the turn.
+            limit (int, optional): Maximum number of results per query. Defaults to 5.
+
+        Returns:
+            List[List[ScoredPoint]]: The post-processed results of each query.
+        """
+        mmr = query_config["mmr"]
+        seen = set()
+        selected_vectors: List[np.ndarray] = []
+        result_list = []
+        for query in queries:
+            if mmr["enabled"]:
+                candidates = self.query_documents(
+                    collection_name,
+                    query,
+                    limit=max(limit, mmr["fetch_limit"]),
+                    with_vectors=True,
+                    token_budget=None,
+                )
+            else:
+                candidates = self.query_documents(collection_name, query, limit=limit)
+
+            if query_config["dedup"]:
+                unique, hashes = [], set()
+                for point in candidates:
+                    content_hash = self.content_hash(point)
+                    if {point.id, content_hash} & seen or content_hash in hashes:
+                        continue
+                    hashes.add(content_hash)
+                    unique.append(point)
+                candidates = unique
+            if mmr["enabled"]:
+                candidates = self.maximal_marginal_relevance(
+                    candidates, selected_vectors, limit, mmr["lambda"]
+                )
+                candidates = self.truncate_results(
+                    candidates, token_budget=cutoff_config["token_budget"]
+                )
+                selected_vectors.extend(self.unit_vector(point) for point in candidates)
+
+            seen.update(point.id for point in candidates)
+            seen.update(self.content_hash(point) for point in candidates)
+            result_list.append(candidates)
+        return result_list
+
+    @staticmethod
+    def content_hash(point: ScoredPoint) -> str:
+        text = point.payload["doc"]["text"] if point.payload else ""
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def point_id(doc: Dict[str, str]) -> str:
+        """
+        Deterministic id of a document, upserting the same document again overwrites its point
+        while documents upserted by concurrent or successive calls never collide.
+        """
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, json.dumps(doc, sort_keys=True)))
+
+    @staticmethod
+    def unit_vector(point: ScoredPoint) -> np.ndarray:
+        vector = (
+            point.vector["dense"] if isinstance(point.vector, dict) else point.vector
+        )
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    def maximal_marginal_relevance(
+        self,
+        candidates: List[ScoredPoint],
+        selected_vectors: List[np.ndarray],
+        limit: int,
+        mmr_lambda: float,
+    ) -> List[ScoredPoint]:
+        """
+        Greedy maximal marginal relevance over the candidates.
+        Relevance is the candidate score normalized by the best score, redundancy is the highest
+        cosine similarity to an already selected vector.
+        """
+        if not candidates:
+            return []
+        vectors = np.stack([self.unit_vector(point) for point in candidates])
+        scores = np.asarray([point.score for point in candidates], dtype=np.float32)
+        relevance = scores / (np.abs(scores).max() + 1e-12)
+        if selected_vectors:
+            redundancy = (vectors @ np.stack(selected_vectors).T).max(axis=1)
+        else:
+            redundancy = np.full(len(candidates), -1.0, dtype=np.float32)
+
+        remaining = list(range(len(candidates)))
+        chosen: List[int] = []
+        while remaining and len(chosen) < limit:
+            marginal = (
+                mmr_lambda * relevance[remaining]
+                - (1 - mmr_lambda) * redundancy[remaining]
+            )
+            best = remaining.pop(int(np.argmax(marginal)))
+            chosen.append(best)
+            redundancy = np.maximum(redundancy, vectors @ vectors[best])
+        return [candidates[i] for i in chosen]
+
+    def touch(self, collection_name: str):
+        self._last_access[collection_name] = time.time()
+
+    def delete_stale_collections(self, ttl: float) -> List[str]:
+        """
+        Deletes session scoped collections that have not been accessed within the ttl.
+        Collections left over from a previous process are considered accessed at startup.
+        Args:
+            ttl (float): Time to live of a session collection in seconds
+
+        Returns:
+            List[str]: Names of the deleted collections
+        """
+        now = time.time()
+        deleted = []
+        for collection_name in self.get_collections():
+            if not SESSION_PATTERN.match(collection_name):
+                continue
+            last_access = self._last_access.get(collection_name, self._started)
+            if now - last_access > ttl:
+                self.delete_collection(collection_name)
+                self._last_access.pop(collection_name, None)
+                deleted.append(collection_name)
+        return deleted
+
     def get_embeddings(self, text_list: List):
         """
         Generate embeddings for a list of text chunks using the embedding model.
@@ -83,56 +494,701 @@ class Qdrant:
             doc = self.nlp(text)
             return list({ent.text for ent in doc.ents})
 
-    def upsert_documents(self, collection_name: str, doc_list: List[Dict[str, str]]):
+
+class Qdrant(VectorDB):
+    def __init__(self):
+        super().__init__()
+        self.client = QdrantClient(url=os.getenv("QDRANT_URL"))
+
+    def create_collection(self, collection_name: str, recreate: bool = True):
+        """
+        Creates a new collection in the vector database with specified parameters.
+        If a collection with the same name already exists, it will be deleted first.
+        Args:
+            collection_name (str): Name of the collection to be created
+            recreate (bool): Whether an existing collection is deleted, it is kept otherwise
+        """
+        if self.client.collection_exists(collection_name):
+            if not recreate:
+                self.touch(collection_name)
+                return
+            self.client.delete_collection(collection_name)
+
+        self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config={"dense": VectorParams(size=768, distance=Distance.COSINE)},
+            sparse_vectors_config={"bm25": SparseVectorParams(modifier=Modifier.IDF)},
+        )
+        self.client.create_payload_index(
+            collection_name, "fetched_at", field_schema=PayloadSchemaType.FLOAT
+        )
+        self.client.create_payload_index(
+            collection_name, "doc.url", field_schema=PayloadSchemaType.KEYWORD
+        )
+        self._query_cache.bump(collection_name)
+        self.touch(collection_name)
+
+    def delete_collection(self, collection_name: str):
+        """
+        Deletes a collection from the vector database if it exists.
+        Args:
+            collection_name (str): Name of the collection to be deleted
+        """
+        if self.client.collection_exists(collection_name):
+            self.client.delete_collection(collection_name)
+        self._query_cache.bump(collection_name)
+
+    def delete_documents(self, collection_name: str, urls: List[str]):
+        """
+        Deletes the documents of the urls from a collection.
+        Args:
+            collection_name (str): Name of the collection
+            urls (List[str]): Urls of the documents to delete
+        """
+        self.client.delete(
+            collection_name=collection_name,
+            points_selector=FilterSelector(
+                filter=Filter(
+                    must=[FieldCondition(key="doc.url", match=MatchAny(any=urls))]
+                )
+            ),
+        )
+        self._query_cache.bump(collection_name)
+
+    def get_collections(self):
+        """
+        Generate a list of collections in the vectordb
+        Returns:
+            List: A list of collections names
+        """
+
+        return [
+            collection.name for collection in self.client.get_collections().collections
+        ]
+
+    def upsert_documents(
+        self,
+        collection_name: str,
+        doc_list: List[Dict[str, str]],
+        embeddings: Optional[List[List[float]]] = None,
+    ):
         """
         Upserts documents into a specified collection in the vector database.
         Args:
             collection_name (str): Name of the collection to upsert documents into
             doc_list (List[Dict[str, str]]): List of documents where each document is a dictionary
                 containing at least a "text" key with the document content
+            embeddings (Optional[List[List[float]]]): Precomputed embeddings of the documents,
+                computed with the embedding model if None
         """
 
         chunks_list = [doc["text"] for doc in doc_list]
-        embeddings = self.get_embeddings(chunks_list)
+        if embeddings is None:
+            embeddings = self.get_embeddings(chunks_list)
         entities_list = self.get_entities(chunks_list)
-        points = [
-            PointStruct(
-                id=idx,
-                vector=embedding,
-                payload={"doc": doc, "entity": entity},
+        fetched_at = time.time()
+        points = []
+        for doc, embedding, entity in zip(doc_list, embeddings, entities_list):
+            indices, values = self.bm25.encode_document(doc["text"])
+            points.append(
+                PointStruct(
+                    id=self.point_id(doc),
+                    vector={
+                        "dense": embedding,
+                        "bm25": SparseVector(indices=indices, values=values),
+                    },
+                    payload={"doc": doc, "entity": entity, "fetched_at": fetched_at},
+                )
             )
-            for idx, (doc, embedding, entity) in enumerate(
-                zip(doc_list, embeddings, entities_list)
-            )
-        ]
         self.client.upsert(collection_name=collection_name, points=points)
+        self._query_cache.bump(collection_name)
+        self.touch(collection_name)
 
-    def query_documents(self, collection_name: str, query: str, limit=5):
+    def search(
+        self,
+        collection_name: str,
+        query: str,
+        query_emb: List[float],
+        limit: int,
+        with_vectors: bool,
+        score_threshold: Optional[float],
+        min_fetched_at: Optional[float] = None,
+        urls: Optional[List[str]] = None,
+    ):
         """
-        Queries the vector database for similar documents based on semantic similarity and named entities.
+        Searches the collection with the query embedding filtered by the named entities of the query.
+        With hybrid search the dense results are fused with BM25 keyword matches in a single query.
         Args:
             collection_name (str): Name of the collection to query in the vector database.
             query (str): The search query text.
-            limit (int, optional): Maximum number of results to return. Defaults to 5.
+            query_emb (List[float]): Embedding of the query.
+            limit (int): Maximum number of results to return.
+            with_vectors (bool): Whether to return the dense vectors.
+            score_threshold (Optional[float]): Minimum cosine similarity of the dense results.
+            min_fetched_at (Optional[float]): Minimum upsert time of the results.
+            urls (Optional[List[str]]): Only the chunks of the pages of these urls are returned.
 
         Returns:
             list: List of Point objects containing the matched documents and their metadata.
-                 Each Point contains payload with document information.
         """
 
-        query_emb = self.embedding_model(query)
         query_entities: List[str] = self.get_entities(query)  # type: ignore
         filter_conditions: List[Condition] = [
             FieldCondition(key="entity", match=MatchValue(value=entity))
             for entity in query_entities
         ]
-        query_filter = Filter(should=filter_conditions)
+        required: List[Condition] = (
+            []
+            if min_fetched_at is None
+            else [FieldCondition(key="fetched_at", range=Range(gte=min_fetched_at))]
+        )
+        if urls is not None:
+            required.append(FieldCondition(key="doc.url", match=MatchAny(any=urls)))
+        query_filter = Filter(should=filter_conditions, must=required)
+        indices, values = self.bm25.encode_query(query)
+
+        if not self.hybrid or not indices:
+            results = self.client.query_points(
+                collection_name=collection_name,
+                query=query_emb,
+                using="dense",
+                with_vectors=["dense"] if with_vectors else False,
+                with_payload=True,
+                query_filter=query_filter,
+                score_threshold=score_threshold,
+                limit=limit,
+            )
+            return results.points
+
         results = self.client.query_points(
             collection_name=collection_name,
-            query=query_emb[0],
-            with_vectors=False,
+            prefetch=[
+                Prefetch(
+                    query=query_emb,
+                    using="dense",
+                    filter=query_filter,
+                    score_threshold=score_threshold,
+                    limit=max(limit, self.prefetch_limit),
+                ),
+                Prefetch(
+                    query=SparseVector(indices=indices, values=values),
+                    using="bm25",
+                    filter=Filter(must=required),
+                    limit=max(limit, self.prefetch_limit),
+                ),
+            ],
+            query=FusionQuery(fusion=Fusion.RRF),
+            with_vectors=["dense"] if with_vectors else False,
             with_payload=True,
-            query_filter=query_filter,
             limit=limit,
         )
         return results.points
+
+
+class LocalCollection:
+    """
+    On-disk collection of the local vector store.
+    Vectors are kept as a float32 matrix of unit length rows in the append-only `vectors.f32`
+    that is memory-mapped for search, payloads and BM25 term weights are appended to the
+    `records.jsonl` log, the last line of an id wins and deleted ids are logged as tombstones.
+    An upsert appends the new rows, overwrites the vectors of existing ids in place and
+    updates the in-memory indexes of the changed rows only, so its cost does not grow with the
+    collection. The files are rewritten once more than half of the rows are dead.
+    In memory a keyword posting list maps each entity to its rows and an inverted index maps
+    each term to the rows and weights it occurs with.
+    Args:
+        path (str): Directory holding the collection files
+        size (int): Dimension of the vectors
+    """
+
+    VECTORS = "vectors.f32"
+    RECORDS = "records.jsonl"
+    META = "meta.json"
+
+    def __init__(self, path: str, size: int = 768):
+        self.path = path
+        self.vectors_path = os.path.join(path, self.VECTORS)
+        self.records_path = os.path.join(path, self.RECORDS)
+        self.meta_path = os.path.join(path, self.META)
+        self.size = size
+        self.reset()
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.isfile(os.path.join(path, cls.META)) or os.path.isfile(
+            os.path.join(path, "records.json")
+        )
+
+    def reset(self):
+        self.ids: List[Optional[Union[int, str]]] = []
+        self.records: List[Optional[Dict]] = []
+        self.vectors: np.ndarray = np.empty((0, self.size), dtype=np.float32)
+        self.rows: Dict[Union[int, str], int] = {}
+        self.live: np.ndarray = np.zeros(0, dtype=bool)
+        self.fetched_at: np.ndarray = np.zeros(0, dtype=np.float64)
+        self.postings: Dict[str, Set[int]] = {}
+        self.url_rows: Dict[str, Set[int]] = {}
+        self.inverted_index: Dict[int, Dict[int, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def create(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.write([], np.empty((0, self.size), dtype=np.float32))
+
+    def load(self):
+        if not os.path.isfile(self.meta_path):
+            self.migrate()
+            return
+        with open(self.meta_path, "r") as file:
+            self.size = json.load(file)["size"]
+        self.reset()
+        rows = 0
+        with open(self.records_path, "r") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("deleted"):
+                    self.delete_row(self.rows.get(record["id"]))
+                elif record["id"] in self.rows:
+                    self.set_row(self.rows[record["id"]], record)
+                else:
+                    self.set_row(rows, record)
+                    rows += 1
+        # vectors appended by an upsert whose records were not written are dropped
+        with open(self.vectors_path, "r+b") as file:
+            file.truncate(rows * self.size * 4)
+        self.map_vectors(rows)
+
+    def migrate(self):
+        """
+        Converts a collection stored as `records.json` and `vectors.npy` to the append-only files.
+        """
+        with open(os.path.join(self.path, "records.json"), "r") as file:
+            records = json.load(file)
+        vectors = np.load(os.path.join(self.path, "vectors.npy"))
+        self.size = vectors.shape[1] if vectors.ndim == 2 else self.size
+        self.write(records, vectors)
+        os.remove(os.path.join(self.path, "records.json"))
+        os.remove(os.path.join(self.path, "vectors.npy"))
+
+    def write(self, records: List[Dict], vectors: np.ndarray):
+        """
+        Rewrites the collection files atomically with only the given rows.
+        """
+        tmp_vectors = self.vectors_path + ".tmp"
+        with open(tmp_vectors, "wb") as file:
+            file.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        tmp_records = self.records_path + ".tmp"
+        with open(tmp_records, "w") as file:
+            file.writelines(json.dumps(record) + "\n" for record in records)
+        with open(self.meta_path, "w") as file:
+            json.dump({"size": self.size}, file)
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_records, self.records_path)
+        self.reset()
+        for row, record in enumerate(records):
+            self.set_row(row, record)
+        self.map_vectors(len(records))
+
+    def map_vectors(self, rows: int):
+        self.vectors = (
+            np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.size)
+            )
+            if rows
+            else np.empty((0, self.size), dtype=np.float32)
+        )
+
+    def grow(self, rows: int):
+        """
+        Grows the per row arrays geometrically to hold the rows.
+        """
+        if rows <= len(self.live):
+            return
+        capacity = max(rows, 2 * len(self.live), 1024)
+        self.live = np.concatenate(
+            [self.live, np.zeros(capacity - len(self.live), dtype=bool)]
+        )
+        self.fetched_at = np.concatenate(
+            [self.fetched_at, np.zeros(capacity - len(self.fetched_at))]
+        )
+
+    def unindex_row(self, row: int):
+        record = self.records[row]
+        if record is None:
+            return
+        for entity in record["payload"].get("entity", []):
+            self.postings.get(entity, set()).discard(row)
+        self.url_rows.get(record["payload"]["doc"].get("url"), set()).discard(row)
+        for term in record["sparse"]["indices"]:
+            self.inverted_index.get(term, {}).pop(row, None)
+
+    def set_row(self, row: int, record: Dict):
+        """
+        Stores the record in the row and updates the indexes of that row.
+        """
+        if row == len(self.records):
+            self.ids.append(None)
+            self.records.append(None)
+            self.grow(row + 1)
+        else:
+            self.unindex_row(row)
+        self.ids[row] = record["id"]
+        self.records[row] = record
+        self.rows[record["id"]] = row
+        self.live[row] = True
+        self.fetched_at[row] = record["payload"].get("fetched_at", 0.0)
+        for entity in record["payload"].get("entity", []):
+            self.postings.setdefault(entity, set()).add(row)
+        self.url_rows.setdefault(record["payload"]["doc"].get("url"), set()).add(row)
+        for term, weight in zip(
+            record["sparse"]["indices"], record["sparse"]["values"]
+        ):
+            self.inverted_index.setdefault(term, {})[row] = weight
+
+    def delete_row(self, row: Optional[int]):
+        if row is None or not self.live[row]:
+            return
+        self.unindex_row(row)
+        self.rows.pop(self.ids[row], None)  # type: ignore
+        self.ids[row] = None
+        self.records[row] = None
+        self.live[row] = False
+
+    def upsert(self, records: List[Dict], vectors: np.ndarray):
+        """
+        Appends new rows and overwrites rows whose id already exists.
+        Records repeating an id of the batch, such as identical chunks of a document, are
+        collapsed into the last one.
+        """
+        last = {record["id"]: idx for idx, record in enumerate(records)}
+        if len(last) < len(records):
+            keep = sorted(last.values())
+            records = [records[idx] for idx in keep]
+            vectors = np.asarray(vectors)[keep]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rows = len(self.records)
+        appended = []
+        with open(self.vectors_path, "r+b") as file:
+            for record, vector in zip(records, vectors):
+                row = self.rows.get(record["id"])
+                if row is None:
+                    appended.append(vector)
+                    continue
+                file.seek(row * self.size * 4)
+                file.write(vector.tobytes())
+            if appended:
+                file.seek(rows * self.size * 4)
+                file.write(np.asarray(appended, dtype=np.float32).tobytes())
+        with open(self.records_path, "a") as file:
+            file.writelines(json.dumps(record) + "\n" for record in records)
+        for record in records:
+            row = self.rows.get(record["id"])
+            self.set_row(len(self.records) if row is None else row, record)
+        self.map_vectors(len(self.records))
+
+    def remove(self, urls: List[str]):
+        """
+        Deletes the rows of the documents of the urls.
+        """
+        removed = [self.ids[row] for row in self.url_filter(urls)]
+        if not removed:
+            return
+        with open(self.records_path, "a") as file:
+            file.writelines(
+                json.dumps({"id": idx, "deleted": True}) + "\n" for idx in removed
+            )
+        for idx in removed:
+            self.delete_row(self.rows.get(idx))
+        if len(self) < len(self.records) / 2:
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrites the files with the live rows only.
+        """
+        live = np.flatnonzero(self.live[: len(self.records)])
+        self.write(
+            [self.records[row] for row in live],  # type: ignore
+            np.asarray(self.vectors[live], dtype=np.float32),
+        )
+
+    def url_filter(self, urls: List[str]) -> Set[int]:
+        """
+        Rows of the chunks of the pages of the urls.
+        """
+        return {row for url in urls for row in self.url_rows.get(url, ())}
+
+    def dense_search(
+        self,
+        query: np.ndarray,
+        entities: List[str],
+        limit: int,
+        score_threshold: Optional[float] = None,
+        min_fetched_at: Optional[float] = None,
+        rows_filter: Optional[Set[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Cosine top-k over the rows matching any of the entities, or all rows if no entity is given.
+        Rows scoring below the score_threshold, upserted before min_fetched_at or missing from
+        the rows_filter are dropped.
+        """
+        if entities:
+            candidates = sorted(
+                {row for entity in entities for row in self.postings.get(entity, ())}
+            )
+            rows = np.asarray(candidates, dtype=np.int64)
+        else:
+            rows = np.flatnonzero(self.live[: len(self.records)])
+        if min_fetched_at is not None:
+            rows = rows[self.fetched_at[rows] >= min_fetched_at]
+        if rows_filter is not None:
+            rows = rows[np.isin(rows, np.fromiter(rows_filter, dtype=np.int64))]
+        if not len(rows):
+            return []
+
+        scores = self.vectors[rows] @ query
+        k = min(limit, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        if score_threshold is not None:
+            top = top[scores[top] >= score_threshold]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def sparse_search(
+        self,
+        terms: List[int],
+        limit: int,
+        min_fetched_at: Optional[float] = None,
+        rows_filter: Optional[Set[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        BM25 top-k over the inverted index, rows upserted before min_fetched_at or missing from
+        the rows_filter are dropped.
+        """
+        scores: Dict[int, float] = {}
+        for term in terms:
+            postings = self.inverted_index.get(term, {})
+            if not postings:
+                continue
+            idf = BM25.idf(len(self), len(postings))
+            for row, weight in postings.items():
+                if min_fetched_at is not None and self.fetched_at[row] < min_fetched_at:
+                    continue
+                if rows_filter is not None and row not in rows_filter:
+                    continue
+                scores[row] = scores.get(row, 0.0) + idf * weight
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def point(self, row: int, score: float, with_vectors=False) -> ScoredPoint:
+        return ScoredPoint(
+            id=self.ids[row],
+            version=0,
+            score=score,
+            payload=self.records[row]["payload"],  # type: ignore
+            vector=self.vectors[row].tolist() if with_vectors else None,
+        )
+
+
+class LocalVectorDB(VectorDB):
+    """
+    In-process vector store for single-user deployments and CI.
+    Collections live under a local directory and are shared by every instance in the process.
+    Args:
+        path (str, optional): Root directory of the store, defaults to the configured path
+    """
+
+    _collections: Dict[str, LocalCollection] = {}
+    _lock = Lock()
+
+    def __init__(self, path: Optional[str] = None):
+        super().__init__()
+        self.path = path or vectordb_config["local"]["path"]
+        os.makedirs(self.path, exist_ok=True)
+
+    def get_collection(self, collection_name: str) -> LocalCollection:
+        collection_path = os.path.join(self.path, collection_name)
+        if collection_path not in self._collections:
+            if not LocalCollection.exists(collection_path):
+                raise ValueError(f"Collection {collection_name} does not exist")
+            collection = LocalCollection(collection_path)
+            collection.load()
+            self._collections[collection_path] = collection
+        return self._collections[collection_path]
+
+    def create_collection(self, collection_name: str, recreate: bool = True):
+        """
+        Creates a new collection in the vector database with specified parameters.
+        If a collection with the same name already exists, it will be deleted first.
+        Args:
+            collection_name (str): Name of the collection to be created
+            recreate (bool): Whether an existing collection is deleted, it is kept otherwise
+        """
+        if not recreate and collection_name in self.get_collections():
+            self.touch(collection_name)
+            return
+        collection = LocalCollection(os.path.join(self.path, collection_name), size=768)
+        with self._lock:
+            collection.create()
+            self._collections[collection.path] = collection
+        self._query_cache.bump(collection_name)
+        self.touch(collection_name)
+
+    def delete_collection(self, collection_name: str):
+        """
+        Deletes a collection from the vector database if it exists.
+        Args:
+            collection_name (str): Name of the collection to be deleted
+        """
+        collection_path = os.path.join(self.path, collection_name)
+        with self._lock:
+            self._collections.pop(collection_path, None)
+            shutil.rmtree(collection_path, ignore_errors=True)
+        self._query_cache.bump(collection_name)
+
+    def delete_documents(self, collection_name: str, urls: List[str]):
+        """
+        Deletes the documents of the urls from a collection.
+        Args:
+            collection_name (str): Name of the collection
+            urls (List[str]): Urls of the documents to delete
+        """
+        with self._lock:
+            self.get_collection(collection_name).remove(urls)
+        self._query_cache.bump(collection_name)
+
+    def get_collections(self):
+        """
+        Generate a list of collections in the vectordb
+        Returns:
+            List: A list of collections names
+        """
+
+        return [
+            name
+            for name in os.listdir(self.path)
+            if LocalCollection.exists(os.path.join(self.path, name))
+        ]
+
+    def upsert_documents(
+        self,
+        collection_name: str,
+        doc_list: List[Dict[str, str]],
+        embeddings: Optional[List[List[float]]] = None,
+    ):
+        """
+        Upserts documents into a specified collection in the vector database.
+        Args:
+            collection_name (str): Name of the collection to upsert documents into
+            doc_list (List[Dict[str, str]]): List of documents where each document is a dictionary
+                containing at least a "text" key with the document content
+            embeddings (Optional[List[List[float]]]): Precomputed embeddings of the documents,
+                computed with the embedding model if None
+        """
+
+        chunks_list = [doc["text"] for doc in doc_list]
+        if embeddings is None:
+            embeddings = self.get_embeddings(chunks_list)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        entities_list = self.get_entities(chunks_list)
+        fetched_at = time.time()
+        records = []
+        for doc, entity in zip(doc_list, entities_list):
+            indices, values = self.bm25.encode_document(doc["text"])
+            records.append(
+                {
+                    "id": self.point_id(doc),
+                    "payload": {"doc": doc, "entity": entity, "fetched_at": fetched_at},
+                    "sparse": {"indices": indices, "values": values},
+                }
+            )
+        with self._lock:
+            self.get_collection(collection_name).upsert(records, vectors)
+        self._query_cache.bump(collection_name)
+        self.touch(collection_name)
+
+    def search(
+        self,
+        collection_name: str,
+        query: str,
+        query_emb: List[float],
+        limit: int,
+        with_vectors: bool,
+        score_threshold: Optional[float],
+        min_fetched_at: Optional[float] = None,
+        urls: Optional[List[str]] = None,
+    ):
+        """
+        Searches the collection with the query embedding filtered by the named entities of the query.
+        With hybrid search the dense results are fused with BM25 keyword matches.
+        Args:
+            collection_name (str): Name of the collection to query in the vector database.
+            query (str): The search query text.
+            query_emb (List[float]): Embedding of the query.
+            limit (int): Maximum number of results to return.
+            with_vectors (bool): Whether to return the dense vectors.
+            score_threshold (Optional[float]): Minimum cosine similarity of the dense results.
+            min_fetched_at (Optional[float]): Minimum upsert time of the results.
+            urls (Optional[List[str]]): Only the chunks of the pages of these urls are returned.
+
+        Returns:
+            list: List of Point objects containing the matched documents and their metadata.
+        """
+
+        query_vector = np.asarray(query_emb, dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) + 1e-12
+        query_entities: List[str] = self.get_entities(query)  # type: ignore
+        indices, _ = self.bm25.encode_query(query)
+
+        with self._lock:
+            collection = self.get_collection(collection_name)
+            rows_filter = None if urls is None else collection.url_filter(urls)
+            if not self.hybrid or not indices:
+                return [
+                    collection.point(row, score, with_vectors)
+                    for row, score in collection.dense_search(
+                        query_vector,
+                        query_entities,
+                        limit,
+                        score_threshold,
+                        min_fetched_at,
+                        rows_filter,
+                    )
+                ]
+
+            prefetch_limit = max(limit, self.prefetch_limit)
+            dense = collection.dense_search(
+                query_vector,
+                query_entities,
+                prefetch_limit,
+                score_threshold,
+                min_fetched_at,
+                rows_filter,
+            )
+            sparse = collection.sparse_search(
+                indices, prefetch_limit, min_fetched_at, rows_filter
+            )
+            fused = reciprocal_rank_fusion(
+                [[row for row, _ in dense], [row for row, _ in sparse]]
+            )
+            return [
+                collection.point(row, score, with_vectors)  # type: ignore
+                for row, score in fused[:limit]
+            ]
+
+
+def get_vectordb() -> VectorDB:
+    """
+    Returns the vector store backend selected in the configuration.
+    """
+    backend = vectordb_config["backend"]
+    if backend == "qdrant":
+        return Qdrant()
+    elif backend == "local":
+        return LocalVectorDB()
+    else:
+        raise ValueError(f"Unsupported vectordb backend: {backend}")
@@ -0,0 +1,68 @@
+import math
+import re
+import zlib
+from typing import Dict, List, Tuple
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have",
+    "in", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was",
+    "were", "with", "what", "which", "who", "how", "does", "do", "did", "any",
+}  # fmt: skip
+
+
+class BM25:
+    """
+    BM25 term weighting for sparse lexical retrieval.
+    Documents are encoded with saturated term frequencies and queries with unit weights,
+    the inverse document frequency is applied by the vector store at query time.
+    Args:
+        k1 (float): Term frequency saturation
+        b (float): Document length normalization
+        avg_len (float): Expected average document length in tokens
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_len: float = 256):
+        self.k1 = k1
+        self.b = b
+        self.avg_len = avg_len
+
+    def tokenize(self, text: str) -> List[str]:
+        return [
+            token
+            for token in re.findall(r"\w+", text.lower())
+            if token not in STOPWORDS
+        ]
+
+    def term_id(self, token: str) -> int:
+        return zlib.crc32(token.encode("utf-8")) & 0x7FFFFFFF
+
+    def encode_document(self, text: str) -> Tuple[List[int], List[float]]:
+        """
+        Encodes a document as a sparse vector of BM25 term weights.
+        Returns:
+            Tuple[List[int], List[float]]: term ids and their weights
+        """
+        tokens = self.tokenize(text)
+        frequencies: Dict[int, int] = {}
+        for token in tokens:
+            term = self.term_id(token)
+            frequencies[term] = frequencies.get(term, 0) + 1
+
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_len)
+        indices = list(frequencies)
+        values = [
+            frequencies[term] * (self.k1 + 1) / (frequencies[term] + norm)
+            for term in indices
+        ]
+        return indices, values
+
+    def encode_query(self, text: str) -> Tuple[List[int], List[float]]:
+        """
+        Encodes a query as a sparse vector with one unit weight per unique term.
+        """
+        indices = list({self.term_id(token) for token in self.tokenize(text)})
+        return indices, [1.0] * len(indices)
+
+    @staticmethod
+    def idf(n_docs: int, doc_freq: int) -> float:
+        return math.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
@@ -0,0 +1,214 @@
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+
+class QueryCache:
+    """
+    In-process cache of vector search results per collection.
+    Entries are keyed on the normalized query text and the search parameters and are invalidated
+    by a collection version counter that is bumped whenever the collection changes.
+    In semantic mode a query whose embedding is within a cosine threshold of a cached query
+    with the same parameters reuses its results.
+    Args:
+        max_entries (int): Maximum number of entries kept per collection, least recently used first out
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.lock = Lock()
+        self.versions: Dict[str, int] = {}
+        self.entries: Dict[str, OrderedDict] = {}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return re.sub(r"\s+", " ", query.lower()).strip(" ?.!,;:")
+
+    def version(self, collection_name: str) -> int:
+        with self.lock:
+            return self.versions.get(collection_name, 0)
+
+    def bump(self, collection_name: str):
+        """
+        Invalidates every cached result of the collection.
+        """
+        with self.lock:
+            self.versions[collection_name] = self.versions.get(collection_name, 0) + 1
+            self.entries.pop(collection_name, None)
+
+    def get(self, collection_name: str, key: Hashable) -> Optional[List[Any]]:
+        with self.lock:
+            entries = self.entries.get(collection_name)
+            if entries is None or key not in entries:
+                return None
+            version, _, _, results = entries[key]
+            if version != self.versions.get(collection_name, 0):
+                del entries[key]
+                return None
+            entries.move_to_end(key)
+            return results
+
+    def get_similar(
+        self,
+        collection_name: str,
+        params: Hashable,
+        embedding: List[float],
+        threshold: float,
+    ) -> Optional[List[Any]]:
+        """
+        Returns the results of the most similar cached query with the same parameters if its
+        cosine similarity to the embedding is at least the threshold.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) + 1e-12
+        best: Tuple[float, Optional[List[Any]]] = (threshold, None)
+        with self.lock:
+            version = self.versions.get(collection_name, 0)
+            for entry_version, entry_params, vector, results in self.entries.get(
+                collection_name, {}
+            ).values():
+                if entry_version != version or entry_params != params:
+                    continue
+                similarity = float(vector @ query)
+                if similarity >= best[0]:
+                    best = (similarity, results)
+        return best[1]
+
+    def put(
+        self,
+        collection_name: str,
+        key: Hashable,
+        params: Hashable,
+        version: int,
+        embedding: List[float],
+        results: List[Any],
+    ):
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) + 1e-12
+        with self.lock:
+            if version != self.versions.get(collection_name, 0):
+                return
+            entries = self.entries.setdefault(collection_name, OrderedDict())
+            entries[key] = (version, params, vector, results)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+
+class DiskCache:
+    """
+    Persistent key-value cache backed by sqlite and shared across sessions.
+    Values are stored as JSON, entries expire after the ttl and the least recently used entries
+    are evicted once the namespace holds more than max_entries. Expired and excess entries are
+    removed in a batch every EVICTION_INTERVAL writes, so the namespace may briefly hold up to
+    that many more entries.
+    Args:
+        path (str): Path of the sqlite database file
+        namespace (str): Table holding the entries of this cache
+        ttl (Optional[float]): Seconds after which an entry expires, never if None
+        max_entries (Optional[int]): Maximum number of entries, unbounded if None
+    """
+
+    EVICTION_INTERVAL = 100
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {namespace} "
+                "(key TEXT PRIMARY KEY, value TEXT, created REAL, accessed REAL)"
+            )
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {namespace}_created ON {namespace} (created)"
+            )
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {namespace}_accessed ON {namespace} (accessed)"
+            )
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value or None if the key is missing or expired.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                f"SELECT value, created FROM {self.namespace} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            self.connection.execute(
+                f"UPDATE {self.namespace} SET accessed = ? WHERE key = ?", (now, key)
+            )
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO {self.namespace} VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self.writes += 1
+            if self.writes % self.EVICTION_INTERVAL == 0:
+                self.evict(now)
+
+    def evict(self, now: float):
+        """
+        Deletes the expired entries and the least recently used entries past max_entries.
+        Called with the lock held inside a transaction.
+        """
+        if self.ttl is not None:
+            self.connection.execute(
+                f"DELETE FROM {self.namespace} WHERE created < ?",
+                (now - self.ttl,),
+            )
+        if self.max_entries is not None:
+            (count,) = self.connection.execute(
+                f"SELECT COUNT(*) FROM {self.namespace}"
+            ).fetchone()
+            if count > self.max_entries:
+                self.connection.execute(
+                    f"DELETE FROM {self.namespace} WHERE key IN "
+                    f"(SELECT key FROM {self.namespace} ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def delete(self, key: str):
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"DELETE FROM {self.namespace} WHERE key = ?", (key,)
+            )
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Hit and miss counts of this instance.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,18 @@
+import multiprocessing
+from multiprocessing.context import BaseContext
+
+# Modules of the functions run in the worker pools
+PRELOAD = ["ghost_writer.modules.fetcher", "ghost_writer.modules.knowledgebase"]
+
+
+def get_process_context() -> BaseContext:
+    """
+    Multiprocessing context of the worker pools.
+    Workers are forked from a fork server that is started without the threads of this process,
+    forking this process would copy the crawler loop, the connection pools and the server
+    threads into them. The fork server imports the modules of the worker functions once, so
+    new workers start without importing them again.
+    """
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(PRELOAD)
+    return context
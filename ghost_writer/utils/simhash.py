@@ -0,0 +1,83 @@
+import hashlib
+import re
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+BITS = 64
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    64 bit SimHash of the word shingles of a text.
+    Texts that differ in a few words have fingerprints that differ in a few bits.
+    """
+    words = re.findall(r"\w+", text.lower())
+    shingles = {
+        " ".join(words[idx : idx + shingle_size])
+        for idx in range(max(1, len(words) - shingle_size + 1))
+    }
+    hashes = np.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(),
+                "little",
+            )
+            for shingle in shingles
+        ],
+        dtype=np.uint64,
+    )
+    bits = (hashes[:, None] >> np.arange(BITS, dtype=np.uint64)) & np.uint64(1)
+    weights = bits.sum(axis=0).astype(np.int64) * 2 - len(hashes)
+    return int(sum(1 << idx for idx in np.flatnonzero(weights > 0)))
+
+
+class NearDuplicateDetector:
+    """
+    Detects near-duplicate texts by the Hamming distance of their SimHash fingerprints.
+    Fingerprints are split into max_distance + 1 bands so any two fingerprints within the
+    distance share at least one band, only the fingerprints in the same band buckets are compared.
+    Args:
+        max_distance (int): Maximum number of differing bits of near-duplicates
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = -(-BITS // self.bands)
+        self.buckets: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+        self.keys: Dict[int, str] = {}
+        self.lock = Lock()
+
+    def band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        mask = (1 << self.band_bits) - 1
+        return [
+            (band, (fingerprint >> (band * self.band_bits)) & mask)
+            for band in range(self.bands)
+        ]
+
+    def match(self, text: str, key: str = "") -> Optional[str]:
+        """
+        Returns the key of a seen near-duplicate of the text, otherwise remembers the text under
+        the key and returns None.
+        """
+        fingerprint = simhash(text)
+        bands = self.band_keys(fingerprint)
+        with self.lock:
+            if fingerprint in self.keys:
+                return self.keys[fingerprint]
+            for band, bucket in bands:
+                for other in self.buckets[band].get(bucket, ()):
+                    if (fingerprint ^ other).bit_count() <= self.max_distance:
+                        return self.keys[other]
+            self.keys[fingerprint] = key
+            for band, bucket in bands:
+                self.buckets[band].setdefault(bucket, []).append(fingerprint)
+        return None
+
+    def is_duplicate(self, text: str) -> bool:
+        """
+        Returns True if a near-duplicate of the text was seen, otherwise remembers the text.
+        """
+        return self.match(text) is not None
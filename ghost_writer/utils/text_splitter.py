@@ -0,0 +1,117 @@
+from collections import deque
+from typing import Iterable, Iterator, List, Optional
+
+SEPARATORS = [
+    "\n\n",
+    "\n",
+    ".",
+    "\uff0e",
+    "\u3002",
+    ",",
+    "\uff0c",
+    "\u3001",
+    " ",
+    "\u200b",
+    "",
+]
+
+
+class RecursiveTextSplitter:
+    """
+    Recursive character text splitter producing the same chunks as langchain's
+    RecursiveCharacterTextSplitter with plain separators kept at the start of each split and
+    surrounding whitespace stripped.
+    Text is split on the first separator found in it, pieces shorter than the chunk size are
+    merged with overlap and longer pieces are split again on the remaining separators.
+    Chunks are yielded as soon as they are complete so they can stream into embedding.
+    Args:
+        chunk_size (int): Maximum number of characters in a chunk
+        chunk_overlap (int): Maximum number of characters shared by consecutive chunks
+        separators (Optional[List[str]]): Separators in order of preference
+    """
+
+    def __init__(
+        self,
+        chunk_size: int,
+        chunk_overlap: int = 0,
+        separators: Optional[List[str]] = None,
+    ):
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Chunk overlap ({chunk_overlap}) is larger than chunk size ({chunk_size})"
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators if separators is not None else SEPARATORS
+
+    def split_text(self, text: str) -> List[str]:
+        return list(self.iter_chunks(text))
+
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        """
+        Lazily splits the text into chunks.
+        """
+        return self._split(text, self.separators)
+
+    def _split(self, text: str, separators: List[str]) -> Iterator[str]:
+        separator = separators[-1]
+        remaining: List[str] = []
+        for idx, candidate in enumerate(separators):
+            if not candidate:
+                separator = candidate
+                break
+            if candidate in text:
+                separator = candidate
+                remaining = separators[idx + 1 :]
+                break
+
+        good_splits: List[str] = []
+        for split in self._split_keep_separator(text, separator):
+            if len(split) < self.chunk_size:
+                good_splits.append(split)
+                continue
+            if good_splits:
+                yield from self._merge(good_splits)
+                good_splits = []
+            if remaining:
+                yield from self._split(split, remaining)
+            else:
+                yield split
+        if good_splits:
+            yield from self._merge(good_splits)
+
+    @staticmethod
+    def _split_keep_separator(text: str, separator: str) -> List[str]:
+        """
+        Splits on the separator keeping it at the start of every split but the first.
+        """
+        if not separator:
+            return list(text)
+        first, *rest = text.split(separator)
+        splits = [separator + split for split in rest]
+        if first:
+            splits.insert(0, first)
+        return splits
+
+    def _merge(self, splits: Iterable[str]) -> Iterator[str]:
+        """
+        Merges small splits into chunks of at most chunk_size characters, carrying up to
+        chunk_overlap characters of trailing splits into the next chunk.
+        """
+        current: deque = deque()
+        total = 0
+        for split in splits:
+            length = len(split)
+            if total + length > self.chunk_size and current:
+                chunk = "".join(current).strip()
+                if chunk:
+                    yield chunk
+                while total > self.chunk_overlap or (
+                    total + length > self.chunk_size and total > 0
+                ):
+                    total -= len(current.popleft())
+            current.append(split)
+            total += length
+        chunk = "".join(current).strip()
+        if chunk:
+            yield chunk
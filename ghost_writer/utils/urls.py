@@ -0,0 +1,166 @@
+import hashlib
+import math
+import os
+import re
+from threading import Lock
+from typing import Iterable, Optional, Set
+from urllib.parse import parse_qsl, unquote, urlencode, urlparse, urlunparse
+
+import numpy as np
+
+TRACKING_PARAMS = re.compile(
+    r"^(?:utm_\w+|gclid|dclid|fbclid|msclkid|yclid|igshid|mc_cid|mc_eid|_hsenc|_hsmi|"
+    r"ref|ref_src|spm|srsltid)$",
+    re.IGNORECASE,
+)
+
+# Search engine and social redirectors, mapped to the query parameter holding the target url
+REDIRECTS = {
+    ("google.com", "/url"): "q",
+    ("duckduckgo.com", "/l/"): "uddg",
+    ("bing.com", "/ck/a"): "u",
+    ("l.facebook.com", "/l.php"): "u",
+    ("lnkd.in", "/"): "url",
+}
+
+
+def resolve_redirect(url: str) -> str:
+    """
+    Returns the target of a known redirector url, the url itself otherwise.
+    """
+    parsed = urlparse(url)
+    host = parsed.netloc.lower().removeprefix("www.")
+    for (redirect_host, path), param in REDIRECTS.items():
+        if host == redirect_host and parsed.path.startswith(path):
+            target = dict(parse_qsl(parsed.query)).get(param)
+            if target and target.startswith("http"):
+                return resolve_redirect(unquote(target))
+    return url
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonical form of a url for deduplication.
+    Known redirects are resolved, the scheme is normalized to https, the host is lowercased
+    without www. and default ports, tracking parameters and the fragment are dropped, the
+    remaining query parameters are sorted and the trailing slash of the path is removed.
+    """
+    parsed = urlparse(resolve_redirect(url.strip()))
+    host = (parsed.hostname or "").removeprefix("www.")
+    if parsed.port and parsed.port not in (80, 443):
+        host = f"{host}:{parsed.port}"
+    path = re.sub(r"/{2,}", "/", parsed.path).rstrip("/")
+    path = re.sub(r"/(?:amp|index\.html?)$", "", path)
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+            if not TRACKING_PARAMS.match(key)
+        )
+    )
+    return urlunparse(("https", host, path, "", query, ""))
+
+
+class BloomFilter:
+    """
+    Persistent Bloom filter of strings.
+    Sized for the capacity at the false positive rate, the bit array is stored as a numpy file
+    and reloaded on creation so it can be shared across sessions and restarts.
+    Args:
+        path (Optional[str]): Path of the bit array file, kept in memory only if None
+        capacity (int): Expected number of items
+        error_rate (float): False positive rate at capacity
+    """
+
+    def __init__(
+        self, path: Optional[str], capacity: int = 1_000_000, error_rate: float = 1e-3
+    ):
+        self.path = path
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.lock = Lock()
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        if path and os.path.exists(path):
+            bits = np.load(path)
+            if bits.shape == self.bits.shape:
+                self.bits = bits
+
+    def positions(self, item: str) -> np.ndarray:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return np.array(
+            [(h1 + i * h2) % self.size for i in range(self.hashes)], dtype=np.int64
+        )
+
+    def __contains__(self, item: str) -> bool:
+        positions = self.positions(item)
+        with self.lock:
+            return bool(
+                np.all(
+                    self.bits[positions >> 3] & (1 << (positions & 7)).astype(np.uint8)
+                )
+            )
+
+    def add(self, item: str):
+        positions = self.positions(item)
+        with self.lock:
+            np.bitwise_or.at(
+                self.bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8)
+            )
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp.npy"
+        with self.lock:
+            np.save(tmp_path, self.bits)
+        os.replace(tmp_path, self.path)
+
+
+class URLDedup:
+    """
+    Set of the canonical urls fetched by this session with O(1) membership, optionally backed
+    by a shared Bloom filter of the urls fetched by every session.
+    Urls are only added once their page was fetched. The Bloom filter can only tell that a url
+    was never fetched, it never drops a url on its own.
+    Args:
+        bloom (Optional[BloomFilter]): Shared filter updated along with the set
+    """
+
+    def __init__(self, bloom: Optional[BloomFilter] = None):
+        self.bloom = bloom
+        self.urls: Set[str] = set()
+        self.lock = Lock()
+
+    def __contains__(self, url: str) -> bool:
+        canonical = canonicalize_url(url)
+        with self.lock:
+            return canonical in self.urls
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def maybe_fetched(self, url: str) -> bool:
+        """
+        False only if no session fetched the url, always True without a Bloom filter.
+        """
+        if self.bloom is None or url in self:
+            return True
+        return canonicalize_url(url) in self.bloom
+
+    def add(self, url: str):
+        canonical = canonicalize_url(url)
+        with self.lock:
+            self.urls.add(canonical)
+        if self.bloom is not None:
+            self.bloom.add(canonical)
+
+    def extend(self, urls: Iterable[str]):
+        for url in urls:
+            self.add(url)
+
+    def save(self):
+        if self.bloom is not None:
+            self.bloom.save()
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Type, TypeVar, Union
 
 import openai as oai
@@ -22,6 +23,14 @@ provider_config = yaml.safe_load(open("config/llms.yaml", "r"))
 T = TypeVar("T", bound=BaseModel)
 
 
+@lru_cache(maxsize=None)
+def get_tokenizer():
+    """
+    Tokenizer used for token counting, loaded once per process.
+    """
+    return AutoTokenizer.from_pretrained("Qwen/Qwen2.5-32B-Instruct")
+
+
 class BaseLLM:
     """
     OpenAI Client wrapper with support for multiple providers.
@@ -71,7 +80,7 @@ class BaseLLM:
             api_key=api_key,
         )
 
-        self.tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen2.5-32B-Instruct")
+        self.tokenizer = get_tokenizer()
 
     def count_tokens(self, content: str) -> int:
         token_count = len(self.tokenizer.encode(content))
@@ -109,13 +118,13 @@ class LLM(BaseLLM):
     def generate(
         self, model: str, messages: List[Dict[str, str]], **kwargs: Dict[str, Any]
     ) -> ChatCompletion:
-        self.config |= {
+        config = self.config | {
             "model": model or self.model,
             "messages": messages,
             **kwargs,
         }
         try:
-            response = self.client.chat.completions.create(stream=False, **self.config)
+            response = self.client.chat.completions.create(stream=False, **config)
             return response
         except oai.RateLimitError:
             raise
@@ -174,7 +183,7 @@ class StructLLM(BaseLLM):
         format: Type[T],
         **kwargs: Dict[str, Any],
     ) -> ParsedChatCompletion[T]:
-        self.config |= {
+        config = self.config | {
             "model": model or self.model,
             "messages": messages,
             "response_format": format,
@@ -182,7 +191,7 @@ class StructLLM(BaseLLM):
         }
 
         try:
-            response = self.client.beta.chat.completions.parse(**self.config)
+            response = self.client.beta.chat.completions.parse(**config)
             return response
         except oai.RateLimitError:
             raise
@@ -230,14 +239,14 @@ class EmbeddingModel:
     def generate(
         self, model: str, texts: Union[str, List[str]], **kwargs: Dict[str, Any]
     ) -> CreateEmbeddingResponse:
-        self.config |= {
+        config = self.config | {
             "model": model or self.model,
             "input": texts,
             **kwargs,
         }
 
         try:
-            response = self.client.embeddings.create(**self.config)
+            response = self.client.embeddings.create(**config)
             return response
         except oai.RateLimitError:
             raise
@@ -0,0 +1,46 @@
+import random
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ghost_writer.utils.text_splitter import SEPARATORS, RecursiveTextSplitter
+
+PIECES = [separator for separator in SEPARATORS if separator] + ["  ", "\t"]
+
+
+def random_text(rng: random.Random) -> str:
+    """
+    Words of random length joined by random separators, with long unbroken runs.
+    """
+    parts = []
+    for _ in range(rng.randint(0, 200)):
+        if rng.random() < 0.05:
+            parts.append("x" * rng.randint(20, 300))
+        else:
+            parts.append("".join(rng.choices("abcdefgh", k=rng.randint(1, 12))))
+        parts.append(rng.choice(PIECES))
+    return "".join(parts)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_langchain(seed: int):
+    rng = random.Random(seed)
+    for _ in range(300):
+        chunk_size = rng.randint(1, 400)
+        chunk_overlap = rng.randint(0, chunk_size)
+        text = random_text(rng)
+        expected = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            is_separator_regex=False,
+            separators=SEPARATORS,
+        ).split_text(text)
+        splitter = RecursiveTextSplitter(chunk_size, chunk_overlap)
+        assert splitter.split_text(text) == expected
+        assert list(splitter.iter_chunks(text)) == expected
+
+
+def test_overlap_larger_than_chunk_size():
+    with pytest.raises(ValueError):
+        RecursiveTextSplitter(chunk_size=10, chunk_overlap=11)
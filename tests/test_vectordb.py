@@ -0,0 +1,81 @@
+from typing import List
+
+import numpy as np
+import pytest
+
+from ghost_writer.modules.vectordb import LocalCollection
+
+SIZE = 8
+
+
+def record(idx: str, url: str, terms: List[int]) -> dict:
+    return {
+        "id": idx,
+        "payload": {"doc": {"text": idx, "url": url}, "entity": [], "fetched_at": 0.0},
+        "sparse": {"indices": terms, "values": [1.0] * len(terms)},
+    }
+
+
+def unit(seed: int) -> np.ndarray:
+    vector = np.random.default_rng(seed).standard_normal(SIZE).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def collection(tmp_path) -> LocalCollection:
+    collection = LocalCollection(str(tmp_path / "collection"), size=SIZE)
+    collection.create()
+    return collection
+
+
+def reloaded(collection: LocalCollection) -> LocalCollection:
+    other = LocalCollection(collection.path, size=SIZE)
+    other.load()
+    return other
+
+
+def top(collection: LocalCollection, vector: np.ndarray) -> tuple:
+    row, score = collection.dense_search(vector, [], limit=1)[0]
+    return collection.ids[row], score
+
+
+def test_upsert_and_reload(collection: LocalCollection):
+    collection.upsert(
+        [record(f"p{idx}", f"https://a.com/{idx}", [idx]) for idx in range(5)],
+        np.stack([unit(idx) for idx in range(5)]),
+    )
+    collection.upsert([record("p2", "https://a.com/2", [2])], unit(10)[None])
+    for current in (collection, reloaded(collection)):
+        assert len(current) == 5
+        assert top(current, unit(10)) == ("p2", pytest.approx(1.0))
+        assert top(current, unit(4)) == ("p4", pytest.approx(1.0))
+
+
+def test_upsert_collapses_repeated_ids(collection: LocalCollection):
+    x, z = unit(0), unit(1)
+    collection.upsert(
+        [
+            record("x", "https://a.com/x", [1]),
+            record("x", "https://a.com/x", [1]),
+            record("z", "https://a.com/z", [2]),
+        ],
+        np.stack([x, x, z]),
+    )
+    for current in (collection, reloaded(collection)):
+        assert len(current) == 2
+        assert top(current, z) == ("z", pytest.approx(1.0))
+        assert top(current, x) == ("x", pytest.approx(1.0))
+
+
+def test_remove_filters_and_compacts(collection: LocalCollection):
+    collection.upsert(
+        [record(f"p{idx}", f"https://a.com/{idx % 4}", [idx]) for idx in range(8)],
+        np.stack([unit(idx) for idx in range(8)]),
+    )
+    collection.remove(["https://a.com/0", "https://a.com/1", "https://a.com/2"])
+    for current in (collection, reloaded(collection)):
+        assert sorted(idx for idx in current.ids if idx is not None) == ["p3", "p7"]
+        assert top(current, unit(7)) == ("p7", pytest.approx(1.0))
+        rows = current.url_filter(["https://a.com/3"])
+        results = current.sparse_search([3, 7], 5, rows_filter=rows)
+        assert sorted(current.ids[row] for row, _ in results) == ["p3", "p7"]